@@ -0,0 +1,318 @@
+"""Index of the executables installed on this machine, for the app selector
+
+Executables are collected from the directories on PATH, from .desktop
+launchers (Linux) and from the usual install directories (Program Files,
+/opt, /Applications). Each scanned directory is cached on disk with its
+mtime, so a refresh only lists the directories that changed since.
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import shlex
+import shutil
+import threading
+
+INDEX_PATH = os.path.join(os.path.expanduser("~"), ".productivity_timer_apps.json")
+INDEX_VERSION = 1
+
+# Launchers whose Exec line would make us track the launcher, not the app
+WRAPPERS = {"flatpak", "snap", "gtk-launch"}
+
+
+def search_dirs():
+    """(directory, depth) pairs to look for executables in, depth being how far to descend"""
+    dirs = [(path, 0) for path in os.environ.get("PATH", "").split(os.pathsep) if path]
+    home = os.path.expanduser("~")
+    if os.name == 'nt':
+        for var, sub in (("ProgramFiles", ""), ("ProgramFiles(x86)", ""), ("LOCALAPPDATA", "Programs")):
+            root = os.environ.get(var)
+            if root:
+                dirs.append((os.path.join(root, sub), 2))
+    elif sys.platform == "darwin":
+        dirs += [("/Applications", 1), (os.path.join(home, "Applications"), 1)]
+    else:
+        dirs += [
+            ("/opt", 2),
+            (os.path.join(home, ".local", "bin"), 0),
+            ("/snap/bin", 0),
+            ("/var/lib/flatpak/exports/bin", 0),
+            (os.path.join(home, ".local", "share", "flatpak", "exports", "bin"), 0),
+        ]
+    return dirs
+
+
+def desktop_dirs():
+    """Directories holding .desktop launchers (freedesktop.org layout)"""
+    if os.name == 'nt' or sys.platform == "darwin":
+        return []
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    data_dirs = (os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share").split(":")
+    data_dirs += ["/var/lib/flatpak/exports/share"]
+    return [os.path.join(path, "applications") for path in [data_home] + data_dirs if path]
+
+
+def is_executable(entry):
+    if os.name == 'nt':
+        return entry.name.lower().endswith(".exe") and entry.is_file()
+    # Shared libraries are often executable too
+    if ".so" in entry.name or entry.name.startswith("."):
+        return False
+    return entry.is_file() and os.access(entry.path, os.X_OK)
+
+
+def scan_dir(directory):
+    """{"entries": [[name, path]], "subdirs": [paths]} of one directory"""
+    entries, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif is_executable(entry):
+                        entries.append([entry.name, entry.path])
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return {"entries": entries, "subdirs": subdirs}
+
+
+def parse_desktop_file(path):
+    """(display name, command) of an application launcher, None if it is hidden or not one"""
+    fields = {}
+    try:
+        with open(path, 'r', encoding="utf-8", errors="replace") as f:
+            section = None
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    section = line
+                elif section == "[Desktop Entry]" and "=" in line:
+                    key, value = line.split("=", 1)
+                    fields.setdefault(key.strip(), value.strip())
+    except OSError:
+        return None
+
+    if (fields.get("Type", "Application") != "Application" or fields.get("NoDisplay") == "true"
+            or fields.get("Hidden") == "true" or not fields.get("Exec") or not fields.get("Name")):
+        return None
+    try:
+        args = shlex.split(fields["Exec"])
+    except ValueError:
+        return None
+    # Skip "env VAR=value" prefixes
+    while args and (os.path.basename(args[0]) == "env" or "=" in args[0]):
+        args.pop(0)
+    if not args or os.path.basename(args[0]) in WRAPPERS:
+        return None
+    return fields["Name"], args[0]
+
+
+def scan_desktop_dir(directory):
+    """{"entries": [[name, command]], "subdirs": [paths]} of the launchers in one directory"""
+    entries, subdirs = [], []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(".desktop"):
+                    launcher = parse_desktop_file(entry.path)
+                    if launcher is not None:
+                        entries.append(list(launcher))
+    except OSError:
+        pass
+    return {"entries": entries, "subdirs": subdirs}
+
+
+def resolve_launchers(entries):
+    """[name, path] for each [name, command] launcher whose command can be found"""
+    launchers = []
+    for name, command in entries:
+        path = command if os.path.isabs(command) else shutil.which(command)
+        if path:
+            launchers.append([name, path])
+    return launchers
+
+
+def match_score(query, name):
+    """Sort key for how well name matches query (lower is better), None if it does not
+
+    Prefix matches come first, then matches at the start of a word, then
+    anywhere in the name, then fuzzy matches (the query's characters in
+    order, fewer gaps first). Shorter names win ties.
+    """
+    query, name = query.lower(), name.lower()
+    if name.startswith(query):
+        return (0, len(name))
+    position = name.find(query)
+    if position >= 0:
+        return (1 if name[position - 1] in " -_." else 2, position, len(name))
+
+    gaps, last = 0, -1
+    for char in query:
+        found = name.find(char, last + 1)
+        if found < 0:
+            return None
+        gaps += found - last - 1
+        last = found
+    return (3, gaps, len(name))
+
+
+class AppIndex:
+    """Executables found on this machine as (name, path), searchable by name"""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.entries = []
+        self.cache = None
+        self.scanned = 0
+        self.reused = 0
+        self.refresh_time = 0.0
+
+    def load_cache(self):
+        """Use the entries of the last refresh until the next one finishes, returns whether there were any"""
+        self.cache = self.read_cache()
+        entries = []
+        for record in self.cache["desktop"].values():
+            entries += record["entries"]
+        entries = resolve_launchers(entries)
+        for record in self.cache["dirs"].values():
+            entries += record["entries"]
+        self.entries = self.dedupe(entries)
+        return bool(self.entries)
+
+    def read_cache(self):
+        try:
+            with open(self.path, 'r') as f:
+                cache = json.load(f)
+            if cache.get("version") == INDEX_VERSION:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return {"version": INDEX_VERSION, "dirs": {}, "desktop": {}}
+
+    def refresh(self):
+        """Rescan the directories changed since the cached scan and save the cache"""
+        started = time.perf_counter()
+        old = self.cache if self.cache is not None else self.read_cache()
+        new = {"version": INDEX_VERSION, "dirs": {}, "desktop": {}}
+        self.scanned = self.reused = 0
+
+        # Launchers first: their display names win over bare file names
+        entries = []
+        for directory in desktop_dirs():
+            self.walk(directory, 1, scan_desktop_dir, old["desktop"], new["desktop"], entries)
+        launchers = resolve_launchers(entries)
+
+        executables = []
+        for directory, depth in search_dirs():
+            self.walk(directory, depth, scan_dir, old["dirs"], new["dirs"], executables)
+
+        self.entries = self.dedupe(launchers + executables)
+        self.cache = new
+        self.write_cache(new)
+        self.refresh_time = time.perf_counter() - started
+        return self.entries
+
+    def walk(self, directory, depth, scan, old, new, entries):
+        # Symlinked directories (/bin -> /usr/bin) are scanned once
+        directory = os.path.realpath(directory)
+        if directory in new:
+            return
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return
+
+        record = old.get(directory)
+        if record is None or record["mtime"] != mtime:
+            record = dict(scan(directory), mtime=mtime)
+            self.scanned += 1
+        else:
+            self.reused += 1
+        new[directory] = record
+        entries += record["entries"]
+
+        for subdir in record["subdirs"]:
+            if subdir.endswith(".app"):
+                # macOS bundle: the executable sits in Contents/MacOS
+                self.walk(os.path.join(subdir, "Contents", "MacOS"), 0, scan, old, new, entries)
+            elif depth > 0:
+                self.walk(subdir, depth - 1, scan, old, new, entries)
+
+    def write_cache(self, cache):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving app index: {e}")
+
+    @staticmethod
+    def dedupe(entries):
+        seen = set()
+        unique = []
+        for name, path in entries:
+            if path not in seen:
+                seen.add(path)
+                unique.append((name, path))
+        return unique
+
+    def search(self, query, limit=20):
+        """Best (name, path) matches for query, best first"""
+        query = query.strip()
+        if not query:
+            return []
+        scored = ((match_score(query, name), name, path) for name, path in self.entries)
+        best = heapq.nsmallest(limit, (item for item in scored if item[0] is not None))
+        return [(name, path) for _, name, path in best]
+
+    def stats(self):
+        return {"entries": len(self.entries), "scanned_dirs": self.scanned, "cached_dirs": self.reused,
+                "refresh_time": self.refresh_time}
+
+
+class ExistenceCache:
+    """os.path.exists results remembered for ttl seconds, checked off the calling thread
+
+    A path on a slow or hung network mount can block exists() for a long
+    time, so every check runs on a daemon thread of its own and reports
+    back through a callback (called on that thread).
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self.results = {}
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """True or False if checked within the last ttl seconds, else None"""
+        with self.lock:
+            result = self.results.get(path)
+        if result is None or time.monotonic() - result[1] > self.ttl:
+            return None
+        return result[0]
+
+    def check(self, paths, callback):
+        """Check every path without a fresh result, calling callback(path, exists) for each"""
+        for path in paths:
+            if self.get(path) is not None:
+                continue
+            with self.lock:
+                if path in self.pending:
+                    continue
+                self.pending.add(path)
+            threading.Thread(target=self.run, args=(path, callback), daemon=True).start()
+
+    def run(self, path, callback):
+        exists = os.path.exists(path)
+        with self.lock:
+            self.results[path] = (exists, time.monotonic())
+            self.pending.discard(path)
+        callback(path, exists)
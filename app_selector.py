@@ -1,17 +1,39 @@
 import os
+import threading
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                            QPushButton, QLabel, QComboBox, QFileDialog)
-from PyQt5.QtCore import Qt, pyqtSignal, QSize
-from PyQt5.QtGui import QFont
+                            QPushButton, QLabel, QComboBox, QFileDialog, QCompleter)
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QModelIndex
+from PyQt5.QtGui import QFont, QStandardItem, QStandardItemModel
+from app_index import AppIndex, ExistenceCache
+
+# Search results carry the app name (what the line edit shows once one is
+# chosen) and path next to their "name - path" display text
+NAME_ROLE = Qt.UserRole + 1
+PATH_ROLE = Qt.UserRole + 2
 
 class AppSelectorPage(QMainWindow):
     # Signal to navigate to timer page
     navigate_to_timer = pyqtSignal()
     
+    # Emitted from worker threads, delivered on the GUI thread
+    index_ready = pyqtSignal()
+    path_checked = pyqtSignal(str, bool)
+    
     def __init__(self, app_state):
         super().__init__()
         self.app_state = app_state
         
+        # Installed executables for type-ahead search, built in the background
+        # the first time the page is shown
+        self.app_index = AppIndex()
+        self.index_thread = None
+        self.index_ready.connect(self.on_index_ready)
+        
+        # Recent apps are checked for existence off the GUI thread, a path
+        # on a hung network mount must not freeze the window
+        self.existence = ExistenceCache()
+        self.path_checked.connect(self.on_path_checked)
+        
         self.setWindowTitle("App Selector")
         self.setFixedSize(180, 140)
         self.setWindowFlags(Qt.WindowStaysOnTopHint | Qt.FramelessWindowHint)
@@ -57,8 +79,21 @@ class AppSelectorPage(QMainWindow):
         self.app_selector = QComboBox()
         self.app_selector.setObjectName("app_selector")
         self.app_selector.setMinimumHeight(24)
+        self.app_selector.setEditable(True)
+        self.app_selector.setInsertPolicy(QComboBox.NoInsert)
         self.populate_recent_apps()
         
+        # Type-ahead search over the app index; results are ranked by
+        # AppIndex.search, so the completer shows them unfiltered
+        self.search_model = QStandardItemModel(self)
+        self.completer = QCompleter(self.search_model, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setCompletionRole(NAME_ROLE)
+        self.completer.popup().setMinimumWidth(320)
+        self.completer.activated[QModelIndex].connect(self.on_search_result_chosen)
+        self.app_selector.lineEdit().setCompleter(self.completer)
+        self.app_selector.lineEdit().textEdited.connect(self.update_search_results)
+        
         # Browse button
         browse_layout = QHBoxLayout()
         
@@ -67,8 +102,17 @@ class AppSelectorPage(QMainWindow):
         browse_button.setFixedHeight(24)
         browse_button.clicked.connect(self.browse_for_app)
         
+        # Track the selected app in the background alongside the main one
+        self.also_track_button = QPushButton("+")
+        self.also_track_button.setObjectName("also_track_button")
+        self.also_track_button.setFixedSize(24, 24)
+        self.also_track_button.setToolTip("Also track this app")
+        self.also_track_button.clicked.connect(self.on_also_track_clicked)
+        self.also_track_button.setEnabled(False)
+        
         browse_layout.addStretch()
         browse_layout.addWidget(browse_button)
+        browse_layout.addWidget(self.also_track_button)
         browse_layout.addStretch()
         
         # Begin button
@@ -194,14 +238,69 @@ class AppSelectorPage(QMainWindow):
         y = (screen.height() - size.height()) // 2
         self.move(x, y)
     
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.index_thread is None:
+            self.index_thread = threading.Thread(target=self.build_index, daemon=True)
+            self.index_thread.start()
+    
+    def build_index(self):
+        # Worker thread: cached entries first, then the incremental refresh
+        if self.app_index.load_cache():
+            self.index_ready.emit()
+        self.app_index.refresh()
+        self.index_ready.emit()
+    
+    def on_index_ready(self):
+        line_edit = self.app_selector.lineEdit()
+        if line_edit.hasFocus() and line_edit.isModified():
+            self.update_search_results(line_edit.text())
+    
+    def update_search_results(self, text):
+        self.search_model.clear()
+        for name, path in self.app_index.search(text):
+            item = QStandardItem(f"{name} - {path}")
+            item.setData(name, NAME_ROLE)
+            item.setData(path, PATH_ROLE)
+            item.setToolTip(path)
+            self.search_model.appendRow(item)
+        if self.search_model.rowCount():
+            self.completer.complete()
+    
+    def on_search_result_chosen(self, index):
+        self.select_app(index.data(NAME_ROLE), index.data(PATH_ROLE))
+    
     def populate_recent_apps(self):
+        # Keep the selection across refreshes
+        selected = self.app_selector.currentData()
+        self.app_selector.blockSignals(True)
         self.app_selector.clear()
         self.app_selector.addItem("Select an application...")
         
-        # Add recent apps from saved data
-        for app in self.app_state.app_data.get("recent_apps", []):
-            if os.path.exists(app["path"]):
+        # Add recent apps from saved data. Apps not checked yet are listed
+        # until their check says they are gone
+        recent_apps = self.app_state.app_data.get("recent_apps", [])
+        for app in recent_apps:
+            if self.existence.get(app["path"]) is not False:
                 self.app_selector.addItem(app["name"], app["path"])
+        
+        index = self.app_selector.findData(selected) if selected else -1
+        self.app_selector.setCurrentIndex(max(index, 0))
+        self.app_selector.blockSignals(False)
+        if self.app_selector.currentData() != selected:
+            self.on_app_selected(self.app_selector.currentIndex())
+        
+        self.existence.check([app["path"] for app in recent_apps], self.path_checked.emit)
+    
+    def on_path_checked(self, path, exists):
+        if not exists and self.app_selector.findData(path) > 0:
+            self.populate_recent_apps()
+    
+    def select_app(self, app_name, file_path):
+        self.app_state.add_to_recent_apps(app_name, file_path)
+        self.populate_recent_apps()
+        # Select the newly added app
+        self.app_selector.setCurrentIndex(self.app_selector.findData(file_path))
     
     def browse_for_app(self):
         file_dialog = QFileDialog()
@@ -213,21 +312,29 @@ class AppSelectorPage(QMainWindow):
         )
         
         if file_path:
-            app_name = os.path.basename(file_path)
-            self.app_state.add_to_recent_apps(app_name, file_path)
-            self.populate_recent_apps()
-            # Select the newly added app
-            self.app_selector.setCurrentIndex(self.app_selector.findData(file_path))
+            self.select_app(os.path.basename(file_path), file_path)
     
     def on_app_selected(self, index):
         if index > 0:  # Skip "Select an application..." item
             self.app_state.target_app = self.app_selector.currentData()
             self.app_state.target_app_name = self.app_selector.currentText()
             self.begin_button.setEnabled(True)
+            self.also_track_button.setEnabled(True)
         else:
             self.app_state.target_app = ""
             self.app_state.target_app_name = ""
             self.begin_button.setEnabled(False)
+            self.also_track_button.setEnabled(False)
+    
+    def on_also_track_clicked(self):
+        if self.app_state.target_app:
+            self.app_state.add_target(self.app_state.target_app_name, self.app_state.target_app)
+            self.update_begin_button()
+    
+    def update_begin_button(self):
+        # Show how many extra apps will be tracked alongside the selection
+        extra_targets = len(self.app_state.targets)
+        self.begin_button.setText(f"Begin (+{extra_targets})" if extra_targets else "Begin")
     
     def on_begin_clicked(self):
         if self.app_state.target_app:
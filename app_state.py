@@ -1,87 +1,186 @@
 import os
-import json
 import time
-from PyQt5.QtCore import QObject, pyqtSignal
+from targets import target_key
+from storage import open_store
+from checkpoint import SessionCheckpoint
+from metrics import timed
 
-class AppState(QObject):
-    """Shared state between pages"""
+class TrackedApp:
+    """Timer state for an application tracked alongside the main target"""
     
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.is_running = False
+        self.elapsed_time = 0
+        self.start_time = 0
     
-    app_status_changed = pyqtSignal(bool)
+    def start(self):
+        self.is_running = True
+        if self.start_time == 0:
+            self.start_time = time.time()
+        else:
+            self.start_time = time.time() - self.elapsed_time
     
-    def __init__(self):
-        super().__init__()
-        
+    def pause(self):
+        if self.is_running:
+            self.elapsed_time = time.time() - self.start_time
+        self.is_running = False
+    
+    def reset(self):
+        self.is_running = False
+        self.elapsed_time = 0
+        self.start_time = 0
+
+class AppState:
+    """Shared state between pages, also used by the headless tracker daemon
+
+    Kept free of Qt so the daemon can run without PyQt. With
+    records_sessions=False (GUI attached to a running daemon) sessions are
+    recorded by the daemon and this state only drives the display.
+    """
+    
+    def __init__(self, store=None, records_sessions=True, checkpoint=None):
+        self.records_sessions = records_sessions
         
         self.target_app = ""
         self.target_app_name = ""
         
+        # Extra apps tracked in the background, keyed by lowercase exe basename
+        self.targets = {}
+        
         
         self.is_running = False
         self.elapsed_time = 0
         self.start_time = 0
         
-        
+        # Storage backend ("journal" or "sqlite"), see storage.open_store
+        self.store = store if store is not None else open_store()
         self.app_data = self.load_app_data()
+        
+        # Sessions cut short by a crash are finalized from their last checkpoint
+        self.checkpoint = checkpoint if checkpoint is not None else SessionCheckpoint()
+        if self.records_sessions:
+            self.recover_sessions()
     
+    @timed("load_app_data")
     def load_app_data(self):
-        """Load saved application data"""
-        data_path = os.path.join(os.path.expanduser("~"), ".productivity_timer_data.json")
-        if os.path.exists(data_path):
-            try:
-                with open(data_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading app data: {e}")
-                
-        return {"recent_apps": [], "statistics": {}}
+        """Load saved application data (recent apps and per-app summary)"""
+        return self.store.load()
+    
+    def get_statistics(self):
+        """Per-app totals and rollups, loaded the first time they are asked for"""
+        return self.store.load_statistics()
+    
+    def get_sessions(self):
+        """SessionTable of every recorded session, loaded on first use"""
+        return self.store.load_sessions()
     
+    @timed("save_app_data")
     def save_app_data(self):
         """Save application data"""
-        data_path = os.path.join(os.path.expanduser("~"), ".productivity_timer_data.json")
-        try:
-            with open(data_path, 'w') as f:
-                json.dump(self.app_data, f)
-        except Exception as e:
-            print(f"Error saving app data: {e}")
+        # The store already holds every change, this only compacts it
+        self.store.compact()
     
     def add_to_recent_apps(self, name, path):
         """Add app to recent apps list"""
-        
-        self.app_data["recent_apps"] = [app for app in self.app_data.get("recent_apps", []) 
-                                       if app["path"] != path]
-        
-        
-        self.app_data["recent_apps"].insert(0, {"name": name, "path": path})
-        
-        
-        self.app_data["recent_apps"] = self.app_data["recent_apps"][:5]
-        
-        
-        self.save_app_data()
+        # The store moves it to the front once it has caught up with other
+        # trackers' changes, so none of them is overwritten
+        self.store.append({"op": "recent_app", "name": name, "path": path})
+    
+    def add_target(self, name, path):
+        """Track another app alongside the main target"""
+        key = target_key(path)
+        if key and key not in self.targets:
+            self.targets[key] = TrackedApp(name, path)
     
-    def save_session_stats(self):
-        """Save session statistics"""
-        if self.elapsed_time <= 0 or not self.target_app_name:
+    def remove_target(self, path):
+        """Stop tracking an extra app, saving its session first"""
+        target = self.targets.pop(target_key(path), None)
+        if target is not None:
+            self.finish_target_session(target)
+    
+    def target_paths(self):
+        """Paths of every tracked app, main target first, one per target key"""
+        paths = {}
+        if self.target_app:
+            paths[target_key(self.target_app)] = self.target_app
+        for key, target in self.targets.items():
+            paths.setdefault(key, target.path)
+        return list(paths.values())
+    
+    def target_name(self, path):
+        """Display name of a tracked app, by path"""
+        key = target_key(path)
+        if self.target_app and key == target_key(self.target_app):
+            return self.target_app_name
+        target = self.targets.get(key)
+        return target.name if target is not None else os.path.basename(path)
+
+    def set_target_running(self, key, running):
+        """Start or stop the timer of an extra tracked app"""
+        target = self.targets.get(key)
+        if target is None:
             return
-            
         
-        if self.target_app_name not in self.app_data.get("statistics", {}):
-            self.app_data["statistics"][self.target_app_name] = {
-                "total_time": 0,
-                "sessions": []
-            }
+        if running and not target.is_running:
+            target.start()
+        elif not running and target.is_running:
+            self.finish_target_session(target)
+    
+    def finish_target_session(self, target):
+        """Pause an extra app's timer and record its session"""
+        target.pause()
+        self.record_session(target.name, target.elapsed_time, target.start_time)
+        target.reset()
+    
+    def stop_all_targets(self):
+        """Record sessions for every running extra app"""
+        for target in self.targets.values():
+            if target.is_running:
+                self.finish_target_session(target)
+    
+    @timed("save_session_stats")
+    def save_session_stats(self, resources=None):
+        """Save session statistics, with the app's resource usage summary if sampled"""
+        self.record_session(self.target_app_name, self.elapsed_time, self.start_time, resources)
+    
+    def record_session(self, app_name, elapsed_time, start_time, resources=None):
+        """Record one session for app_name"""
+        if elapsed_time <= 0 or not app_name or not self.records_sessions:
+            return
             
-        
-        from datetime import datetime
-        session = {
-            "date": datetime.now().strftime("%Y-%m-%d"),
-            "duration": int(self.elapsed_time),
-            "start_time": datetime.fromtimestamp(int(self.start_time)).strftime("%H:%M:%S")
+        record = {
+            "op": "session",
+            "app": app_name,
+            "start": int(start_time),
+            "duration": int(elapsed_time)
         }
-        
-        self.app_data["statistics"][self.target_app_name]["sessions"].append(session)
-        self.app_data["statistics"][self.target_app_name]["total_time"] += int(self.elapsed_time)
-        
-        
-        self.save_app_data()
\ No newline at end of file
+        if resources:
+            record["resources"] = resources
+        self.store.append(record)
+        self.checkpoint.clear(app_name)
+    
+    def checkpoint_sessions(self):
+        """Checkpoint every running session so a crash loses at most one interval"""
+        if not self.records_sessions:
+            return
+        now = time.time()
+        if self.is_running and self.target_app_name:
+            self.checkpoint.write(self.target_app_name, self.start_time, now - self.start_time, now)
+        for target in self.targets.values():
+            if target.is_running:
+                self.checkpoint.write(target.name, target.start_time, now - target.start_time, now)
+    
+    def recover_sessions(self):
+        """Record sessions left behind in the checkpoint file"""
+        for app_name, start_time, elapsed in self.checkpoint.recover():
+            self.record_session(app_name, elapsed, start_time)
+    
+    def total_time(self, app_name, start_date=None, end_date=None):
+        """Total tracked seconds for app_name, optionally between two dates (inclusive)"""
+        return self.store.total_time(app_name, start_date, end_date)
+    
+    def get_rollups(self, app_name, period="daily"):
+        """Tracked seconds for app_name per day, ISO week or month"""
+        return self.store.rollups(app_name, period)
\ No newline at end of file
@@ -0,0 +1,386 @@
+"""Benchmarks for the hot paths: process detection, loading and saving data
+
+    python benchmark.py [--quick | --full] [-o RESULTS.json]
+                        [--compare BASELINE.json [--tolerance 0.25]]
+                        [--only scan,history,gui]
+
+Process detection runs against fake_psutil, a synthetic process table of
+--processes sizes with a share of processes denying access to their exe
+(--denied) and a share replaced between scans (--churn). Every scan is one
+TargetMonitor.check(), the call the watcher makes on each poll.
+
+Load and save run against synthetic histories of --sessions sizes, in a
+temporary directory, for each store (--stores). With PyQt5 installed the
+pages are built on the offscreen platform, so no display is needed.
+
+Results are written as JSON. With --compare, every timing that got slower
+than the baseline by more than --tolerance (and by more than --floor-ms)
+is listed and the exit status is 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import platform
+import argparse
+from array import array
+import fake_psutil
+
+SCAN_SIZES = (1000, 5000, 20000, 50000)
+HISTORY_SIZES = (10_000, 100_000, 1_000_000)
+FULL_HISTORY_SIZES = HISTORY_SIZES + (5_000_000,)
+HISTORY_APPS = 20
+HISTORY_YEARS = 5
+# First of January 2021, where synthetic histories start
+HISTORY_START = 1_609_459_200
+
+
+def summarize(times):
+    """Median and spread of a list of durations in seconds, in milliseconds"""
+    times = sorted(times)
+    ms = [t * 1000 for t in times]
+    return {
+        "ms": round(ms[len(ms) // 2], 4),
+        "mean_ms": round(sum(ms) / len(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "max_ms": round(ms[-1], 4),
+        "runs": len(ms),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+# --- process detection ---
+
+SCAN_SCENARIOS = {
+    # Target not running: every check walks the whole table
+    "absent": {"target": "/opt/bench/benchapp", "running": False, "track_tree": False},
+    # Target running: after the first check only the pinned PID is looked at
+    "present": {"target": "/opt/bench/benchapp", "running": True, "track_tree": False},
+    # Target started through a symlink of another name, found by its exe
+    "symlink": {"target": "/opt/bench/benchapp", "running": True, "name": "bench-link", "track_tree": False},
+    # Following process trees: the table is walked (with ppid) on every check
+    "tree": {"target": "/opt/bench/benchapp", "running": True, "track_tree": True},
+}
+
+
+def bench_scans(sizes, scans, denied, churn, results):
+    from process_monitor import TargetMonitor
+    for scenario, config in SCAN_SCENARIOS.items():
+        for size in sizes:
+            table = fake_psutil.ProcessTable(size, denied_ratio=denied, churn=churn)
+            if config["running"]:
+                name = config.get("name", os.path.basename(config["target"]))
+                # The user's own app, so its exe is readable
+                pid = table.spawn(name=name, exe=config["target"], denied=False)
+                table.protected.add(pid)
+                # Stand-in for the app's own children
+                for _ in range(5):
+                    table.protected.add(table.spawn(ppid=pid))
+            fake_psutil.install(table)
+
+            monitor = TargetMonitor(backend="poll", track_tree=config["track_tree"])
+            monitor.set_targets([config["target"]])
+            first, _ = timed(monitor.check)
+            times = []
+            for _ in range(scans):
+                table.churn()
+                elapsed, _ = timed(monitor.check)
+                times.append(elapsed)
+
+            stats = monitor.stats()
+            result = summarize(times)
+            result.update(first_ms=round(first * 1000, 4), processes=size, denied=denied, churn=churn,
+                          full_scans=stats.get("full_scans"), exe_cache_misses=stats.get("exe_cache_misses"),
+                          exe_cache_hit_rate=stats.get("exe_cache_hit_rate"))
+            results[f"scan/{scenario}/p={size}"] = result
+            print(f"scan {scenario:<10} {size:>6} processes  {result['ms']:9.3f} ms/check "
+                  f"(p95 {result['p95_ms']:.3f}, first {result['first_ms']:.3f})")
+
+
+# --- load and save ---
+
+def synthetic_table(count, seed=0):
+    """SessionTable of count sessions of HISTORY_APPS apps spread over HISTORY_YEARS years"""
+    from session_table import SessionTable
+    table = SessionTable()
+    for i in range(HISTORY_APPS):
+        table.app_id(f"app{i:02}")
+
+    span = HISTORY_YEARS * 365 * 86400
+    try:
+        import numpy as np
+    except ImportError:
+        rng = random.Random(seed)
+        table.starts = array('q', sorted(HISTORY_START + rng.randrange(span) for _ in range(count)))
+        table.durations = array('I', (rng.randrange(60, 3600) for _ in range(count)))
+        table.app_column = array('I', (rng.randrange(HISTORY_APPS) for _ in range(count)))
+        return table
+
+    rng = np.random.default_rng(seed)
+    table.starts = array('q', np.sort(HISTORY_START + rng.integers(0, span, count)).astype(np.int64).tobytes())
+    table.durations = array('I', rng.integers(60, 3600, count).astype(np.uint32).tobytes())
+    table.app_column = array('I', rng.integers(0, HISTORY_APPS, count).astype(np.uint32).tobytes())
+    return table
+
+
+def table_statistics(table):
+    """(statistics, summary) of a table, with NumPy when it is installed"""
+    try:
+        import numpy as np
+        from merge import build_statistics_vectorized
+    except ImportError:
+        from storage import build_statistics, summarize as summarize_table
+        return build_statistics(table), summarize_table(table)
+
+    app_ids = np.frombuffer(table.app_column, dtype=np.uint32)
+    statistics = build_statistics_vectorized(table.apps, app_ids, np.frombuffer(table.starts, dtype=np.int64),
+                                             np.frombuffer(table.durations, dtype=np.uint32).astype(np.int64))
+    counts = np.bincount(app_ids, minlength=len(table.apps))
+    summary = {name: {"total_time": statistics[name]["total_time"], "session_count": int(counts[i])}
+               for i, name in enumerate(table.apps) if counts[i]}
+    return statistics, summary
+
+
+def write_synthetic_store(kind, directory, count):
+    """Create a store of count synthetic sessions, returns its path"""
+    from storage import JournalStore, SqliteStore
+    table = synthetic_table(count)
+    recent_apps = [{"name": name, "path": f"/opt/{name}/{name}"} for name in table.apps[:5]]
+
+    if kind == "sqlite":
+        path = os.path.join(directory, "bench.sqlite3")
+        store = SqliteStore(path, legacy_path=None)
+        store.connect()
+        with store.db:
+            store.write_recent_apps(recent_apps)
+            store.db.executemany(
+                "INSERT INTO sessions (app, date, start_time, duration, start) VALUES (?, ?, ?, ?, ?)",
+                ((app_name, time.strftime("%Y-%m-%d", local), time.strftime("%H:%M:%S", local), duration, start)
+                 for app_name, start, duration in table.rows()
+                 for local in (time.localtime(start),)))
+            store.db.execute("INSERT INTO summary (app, total_time, session_count) "
+                             "SELECT app, SUM(duration), COUNT(*) FROM sessions GROUP BY app")
+        store.rebuild_rollups()
+        store.db.close()
+        return path
+
+    path = os.path.join(directory, "bench.json")
+    store = JournalStore(path)
+    statistics, summary = table_statistics(table)
+    store.write_history({"sessions": table, "statistics": statistics}, 0)
+    store.write_snapshot(path, {"recent_apps": recent_apps, "summary": summary}, 0)
+    return path
+
+
+def bench_history(kind, count, repeat, saves, results):
+    from storage import JournalStore, SqliteStore
+    from app_state import AppState
+    from checkpoint import SessionCheckpoint
+
+    directory = tempfile.mkdtemp(prefix="productivity_timer_bench_")
+    try:
+        generate_time, path = timed(lambda: write_synthetic_store(kind, directory, count))
+        checkpoint = SessionCheckpoint(os.path.join(directory, "bench.checkpoint"))
+
+        def open_state():
+            store = JournalStore(path) if kind == "journal" else SqliteStore(path, legacy_path=None)
+            return AppState(store=store, checkpoint=checkpoint)
+
+        # AppState construction is load_app_data plus an (empty) checkpoint recovery
+        load_times, load_history_times = [], []
+        for _ in range(repeat):
+            elapsed, state = timed(open_state)
+            load_times.append(elapsed)
+            elapsed, _ = timed(state.get_sessions)
+            load_history_times.append(elapsed)
+            close_state(state)
+
+        state = open_state()
+        state.target_app_name = "app00"
+        save_times = []
+        for i in range(saves):
+            state.start_time = HISTORY_START + HISTORY_YEARS * 365 * 86400 + i * 3600
+            state.elapsed_time = 1800
+            elapsed, _ = timed(state.save_session_stats)
+            save_times.append(elapsed)
+
+        # The part that runs on the GUI thread, then the background fold
+        compact_time, _ = timed(state.save_app_data)
+        fold_time, _ = timed(state.store.wait)
+        close_state(state)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    prefix = f"history/{kind}/n={count}"
+    results[f"{prefix}/load_app_data"] = summarize(load_times)
+    results[f"{prefix}/load_history"] = summarize(load_history_times)
+    results[f"{prefix}/save_session_stats"] = summarize(save_times)
+    results[f"{prefix}/save_app_data"] = summarize([compact_time])
+    results[f"{prefix}/save_app_data_background"] = summarize([fold_time])
+    print(f"history {kind:<7} {count:>8} sessions  load {results[f'{prefix}/load_app_data']['ms']:9.2f} ms  "
+          f"history {results[f'{prefix}/load_history']['ms']:9.2f} ms  "
+          f"session {results[f'{prefix}/save_session_stats']['ms']:7.2f} ms  "
+          f"save {compact_time * 1000:7.2f} ms (+{fold_time * 1000:.0f} ms in background)  "
+          f"[generated in {generate_time:.1f}s]")
+
+
+def close_state(state):
+    state.store.wait()
+    db = getattr(state.store, "db", None)
+    if db is not None:
+        db.close()
+
+
+# --- pages ---
+
+def bench_gui(repeat, results, skipped):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        skipped["gui"] = "PyQt5 is not installed"
+        print("gui: skipped, PyQt5 is not installed")
+        return
+    from app_state import AppState
+    from storage import JournalStore
+    from checkpoint import SessionCheckpoint
+
+    app = QApplication.instance() or QApplication([])
+    directory = tempfile.mkdtemp(prefix="productivity_timer_bench_")
+    try:
+        state = AppState(store=JournalStore(os.path.join(directory, "bench.json")),
+                         checkpoint=SessionCheckpoint(os.path.join(directory, "bench.checkpoint")))
+        state.target_app, state.target_app_name = "/opt/bench/benchapp", "benchapp"
+
+        import_time, _ = timed(lambda: __import__("app_selector"))
+        results["gui/import_app_selector"] = summarize([import_time])
+        import_time, _ = timed(lambda: __import__("timer_page"))
+        results["gui/import_timer_page"] = summarize([import_time])
+        from app_selector import AppSelectorPage
+        from timer_page import TimerPage
+
+        selector_times, timer_times, update_times = [], [], []
+        for _ in range(repeat):
+            elapsed, page = timed(lambda: AppSelectorPage(state))
+            selector_times.append(elapsed)
+            page.deleteLater()
+
+            elapsed, page = timed(lambda: TimerPage(state))
+            timer_times.append(elapsed)
+            # A stopped timer makes update_time a no-op
+            page.start_timer()
+            for _ in range(100):
+                elapsed, _ = timed(page.update_time)
+                update_times.append(elapsed)
+            page.process_watcher.shutdown()
+            page.deleteLater()
+            app.processEvents()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    results["gui/selector_page"] = summarize(selector_times)
+    results["gui/timer_page"] = summarize(timer_times)
+    results["gui/update_time"] = summarize(update_times)
+    print(f"gui selector page {results['gui/selector_page']['ms']:.2f} ms, timer page "
+          f"{results['gui/timer_page']['ms']:.2f} ms, update_time {results['gui/update_time']['ms']:.4f} ms")
+
+
+# --- comparing runs ---
+
+def compare(baseline, current, tolerance, floor_ms):
+    """(name, baseline ms, current ms) of every timing slower than baseline by more than tolerance"""
+    regressions = []
+    for name, result in sorted(current["results"].items()):
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        before, after = old["ms"], result["ms"]
+        if after > before * (1 + tolerance) and after - before > floor_ms:
+            regressions.append((name, before, after))
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(float(size)) for size in value.split(",") if size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process detection and data loading/saving")
+    parser.add_argument("--quick", action="store_true", help="small sizes only, for a fast check")
+    parser.add_argument("--full", action="store_true", help="include the 5M session history")
+    parser.add_argument("--only", default="scan,history,gui", help="benchmarks to run (scan, history, gui)")
+    parser.add_argument("--processes", type=parse_sizes, help="process table sizes (default 1000..50000)")
+    parser.add_argument("--denied", type=float, default=0.1, help="share of processes denying access to their exe")
+    parser.add_argument("--churn", type=float, default=0.01, help="share of processes replaced between scans")
+    parser.add_argument("--scans", type=int, default=50, help="checks timed per process table")
+    parser.add_argument("--sessions", type=parse_sizes, help="history sizes (default 10k..1M, up to 5M with --full)")
+    parser.add_argument("--stores", default="journal,sqlite", help="stores to benchmark")
+    parser.add_argument("--sqlite-max", type=int, default=1_000_000, help="largest history to build in SQLite")
+    parser.add_argument("--repeat", type=int, default=3, help="repeats of each load (once for 1M+ sessions)")
+    parser.add_argument("--saves", type=int, default=100, help="sessions recorded per history")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--floor-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    # Before anything imports the real psutil
+    fake_psutil.install(fake_psutil.ProcessTable(0))
+
+    only = set(args.only.split(","))
+    processes = args.processes or ([1000, 5000] if args.quick else list(SCAN_SIZES))
+    sessions = args.sessions or ([10_000] if args.quick else list(FULL_HISTORY_SIZES if args.full else HISTORY_SIZES))
+    scans = min(args.scans, 20) if args.quick else args.scans
+
+    results, skipped = {}, {}
+    started = time.perf_counter()
+    if "scan" in only:
+        bench_scans(processes, scans, args.denied, args.churn, results)
+    if "history" in only:
+        for kind in args.stores.split(","):
+            for count in sessions:
+                if kind == "sqlite" and count > args.sqlite_max:
+                    skipped[f"history/{kind}/n={count}"] = f"larger than --sqlite-max {args.sqlite_max}"
+                    continue
+                bench_history(kind, count, 1 if count >= 1_000_000 else args.repeat, args.saves, results)
+    if "gui" in only:
+        bench_gui(args.repeat, results, skipped)
+
+    report = {
+        "meta": {
+            "time": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "duration": round(time.perf_counter() - started, 2),
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance, args.floor_ms)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms ({after / before - 1:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
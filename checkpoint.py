@@ -0,0 +1,112 @@
+import os
+import glob
+import struct
+from file_lock import lock_fd
+
+CHECKPOINT_PATH = os.path.join(os.path.expanduser("~"), ".productivity_timer_data.checkpoint")
+
+# magic, start epoch, elapsed seconds, last update epoch, app name
+SLOT = struct.Struct("<4sqIq240s")
+MAGIC = b"PTCK"
+SLOT_COUNT = 16
+
+
+class SessionCheckpoint:
+    """Fixed-size checkpoint records for sessions that are still running
+
+    Each running session owns one slot in a small file. A checkpoint
+    rewrites that slot in place (one page, one fsync), so a session killed
+    by a crash or power loss can be recovered and recorded on the next start
+    with at most one checkpoint interval missing.
+
+    Every process has a file of its own (the path plus its pid) and holds a
+    lock on it while it lives, so recovery only picks up the files of
+    processes that are gone, never the running sessions of another tracker.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.base_path = path
+        self.path = f"{path}.{os.getpid()}"
+        self.fd = None
+        self.slots = {}
+
+    def open(self):
+        if self.fd is None:
+            flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            self.fd = os.open(self.path, flags, 0o600)
+            lock_fd(self.fd, blocking=False)
+        return self.fd
+
+    def recover(self):
+        """Return (app_name, start_time, elapsed) for every session left by a dead process and clear them"""
+        sessions = []
+        # The bare path is the shared file of older versions
+        for path in [self.base_path] + glob.glob(glob.escape(self.base_path) + ".*"):
+            if path != self.path and not path.endswith(".tmp"):
+                sessions += self.recover_file(path)
+        return sessions
+
+    def recover_file(self, path):
+        try:
+            fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        except FileNotFoundError:
+            return []
+        except OSError as e:
+            print(f"Error recovering checkpoint: {e}")
+            return []
+
+        sessions = []
+        try:
+            # Still locked: its tracker is running. Another process may also
+            # have recovered and removed it since we opened it.
+            stat = os.fstat(fd)
+            if not lock_fd(fd, blocking=False) or not same_file(path, stat):
+                return []
+
+            data = os.read(fd, SLOT.size * SLOT_COUNT)
+            for offset in range(0, len(data) - SLOT.size + 1, SLOT.size):
+                magic, start_time, elapsed, _, name = SLOT.unpack_from(data, offset)
+                if magic == MAGIC and elapsed > 0:
+                    app_name = name.rstrip(b"\0").decode("utf-8", errors="ignore")
+                    sessions.append((app_name, start_time, elapsed))
+            os.remove(path)
+        except OSError as e:
+            print(f"Error recovering checkpoint: {e}")
+        finally:
+            os.close(fd)
+        return sessions
+
+    def write(self, app_name, start_time, elapsed, now):
+        """Rewrite the slot for app_name in place"""
+        slot = self.slots.get(app_name)
+        if slot is None:
+            used = set(self.slots.values())
+            slot = next((i for i in range(SLOT_COUNT) if i not in used), len(self.slots) % SLOT_COUNT)
+            self.slots[app_name] = slot
+
+        record = SLOT.pack(MAGIC, int(start_time), int(elapsed), int(now), app_name.encode("utf-8")[:240])
+        self.write_slot(slot, record)
+
+    def clear(self, app_name):
+        """Forget the checkpoint once the session has been recorded"""
+        slot = self.slots.pop(app_name, None)
+        if slot is not None:
+            self.write_slot(slot, bytes(SLOT.size))
+
+    def write_slot(self, slot, record):
+        try:
+            fd = self.open()
+            os.lseek(fd, slot * SLOT.size, os.SEEK_SET)
+            os.write(fd, record)
+            os.fsync(fd)
+        except OSError as e:
+            print(f"Error writing checkpoint: {e}")
+
+
+def same_file(path, stat):
+    """Whether path still names the file stat was taken from"""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return (current.st_dev, current.st_ino) == (stat.st_dev, stat.st_ino)
@@ -0,0 +1,82 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalSocket
+from ipc import SOCKET_PATH, encode, LineReader
+
+
+class DaemonWatcher(QObject):
+    """Drop-in for ProcessWatcherThread that gets state from the tracker daemon
+
+    watch() asks the daemon to track the apps and subscribes to their status
+    events. Sessions are recorded by the daemon, so shutting the GUI down
+    only disconnects; the daemon keeps tracking.
+    """
+
+    target_status_changed = pyqtSignal(str, bool)
+
+    # Seconds the daemon has counted for a running app, sent after each status change
+    target_elapsed_synced = pyqtSignal(str, float)
+
+    def __init__(self, app_state, parent=None, socket_path=SOCKET_PATH):
+        super().__init__(parent)
+        self.app_state = app_state
+        self.socket_path = socket_path
+        self.reader = LineReader()
+        self.watched = []
+
+        self.socket = QLocalSocket(self)
+        self.socket.readyRead.connect(self.on_ready_read)
+
+    def ensure_connected(self):
+        if self.socket.state() != QLocalSocket.ConnectedState:
+            self.reader = LineReader()
+            self.socket.connectToServer(self.socket_path)
+            if not self.socket.waitForConnected(500):
+                print(f"Could not reach the tracker daemon: {self.socket.errorString()}")
+                return False
+        return True
+
+    def send(self, message):
+        if self.ensure_connected():
+            self.socket.write(encode(message))
+            self.socket.flush()
+
+    def watch(self, target_paths):
+        self.watched = list(target_paths)
+        for path in self.watched:
+            self.send({"cmd": "track", "name": self.app_state.target_name(path), "path": path})
+        self.send({"cmd": "subscribe"})
+
+    def unwatch(self):
+        for path in self.watched:
+            self.send({"cmd": "untrack", "path": path})
+        self.watched = []
+
+    def interact(self):
+        """Tell the daemon the user is active so it polls fast again"""
+        self.send({"cmd": "interact"})
+
+    def start_sampling(self, key, session):
+        """The daemon samples nothing for us"""
+
+    def stop_sampling(self):
+        pass
+
+    def shutdown(self):
+        """Disconnect, leaving the daemon tracking"""
+        self.watched = []
+        self.socket.disconnectFromServer()
+
+    def on_ready_read(self):
+        for message in self.reader.feed(bytes(self.socket.readAll())):
+            if message.get("event") == "status":
+                self.on_status(message)
+            elif "targets" in message:
+                for status in message["targets"]:
+                    self.on_status(status)
+            elif "status" in message:
+                self.on_status(message["status"])
+
+    def on_status(self, status):
+        self.target_status_changed.emit(status["app"], status["running"])
+        if status["running"]:
+            self.target_elapsed_synced.emit(status["app"], float(status["elapsed"]))
@@ -0,0 +1,97 @@
+import math
+import time
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+
+class DisplayScheduler(QObject):
+    """Stopwatch on time.monotonic() that wakes up once per visible second
+
+    Instead of a fixed-rate timer, a single-shot timer is armed for the next
+    whole-second boundary of the elapsed time, and tick is only emitted when
+    the displayed second changes. While suspended (window hidden or
+    minimized) the clock keeps counting but nothing is scheduled.
+    """
+
+    # Whole elapsed seconds, emitted when the visible value changes
+    tick = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.on_timeout)
+
+        self.base = 0.0
+        self.started_at = None
+        self.suspended = False
+        self.last_second = None
+
+        # Wakeup accounting
+        self.wakeups = 0
+        self.ticks = 0
+        self.created = time.monotonic()
+
+    def is_running(self):
+        return self.started_at is not None
+
+    def elapsed(self):
+        """Elapsed seconds on the stopwatch"""
+        if self.started_at is None:
+            return self.base
+        return self.base + time.monotonic() - self.started_at
+
+    def start(self, base_elapsed=0.0):
+        """Start counting from base_elapsed seconds"""
+        self.base = base_elapsed
+        self.started_at = time.monotonic()
+        self.last_second = None
+        self.schedule(0)
+
+    def stop(self):
+        """Freeze the stopwatch at its current value"""
+        self.base = self.elapsed()
+        self.started_at = None
+        self.timer.stop()
+
+    def suspend(self):
+        """Stop waking up, e.g. while the window is hidden"""
+        self.suspended = True
+        self.timer.stop()
+
+    def resume(self):
+        """Catch up immediately and start waking up again"""
+        self.suspended = False
+        if self.is_running():
+            self.schedule(0)
+
+    def schedule(self, delay_ms):
+        if not self.suspended:
+            self.timer.start(delay_ms)
+
+    def on_timeout(self):
+        if not self.is_running():
+            return
+
+        self.wakeups += 1
+        elapsed = self.elapsed()
+        second = int(elapsed)
+        if second != self.last_second:
+            self.last_second = second
+            self.ticks += 1
+            self.tick.emit(second)
+
+        # Sleep until just past the next second boundary
+        remaining = (second + 1) - self.elapsed()
+        self.schedule(max(1, math.ceil(remaining * 1000)))
+
+    def wakeups_per_minute(self):
+        minutes = max(time.monotonic() - self.created, 1e-9) / 60
+        return self.wakeups / minutes
+
+    def stats(self):
+        return {
+            "wakeups": self.wakeups,
+            "ticks": self.ticks,
+            "wakeups_per_minute": self.wakeups_per_minute(),
+        }
@@ -0,0 +1,152 @@
+"""Stream the recorded sessions out as CSV, JSON Lines or Parquet
+
+Sessions are streamed from the store (the journal store's history file a
+chunk of rows at a time, SQLite from a cursor) and written as they are
+read, so memory use does not grow with the size of the export. Parquet
+output needs pyarrow and is written in row groups of BATCH_SIZE rows.
+
+    python export.py --format csv|jsonl|parquet [-o PATH] [--app NAME]
+                     [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--since-last [STATE]]
+
+--since-last only exports sessions recorded after the previous
+--since-last run and remembers where this one stopped in STATE.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import date
+from storage import DATA_PATH, open_store, local_date, date_key
+
+FIELDS = ("row", "app", "date", "start", "start_time", "duration", "resources")
+BATCH_SIZE = 65536
+STATE_PATH = os.path.splitext(DATA_PATH)[0] + ".export_state"
+
+
+def iter_export_rows(store, app_name=None, since=None, until=None, after=0):
+    """Yield one dict per session, filtered by app and local start date (inclusive)"""
+    since, until = date_key(since), date_key(until)
+    for row, app, start, duration, resources in store.iter_sessions(app_name, after):
+        day = local_date(start)
+        if (since is not None and day < since) or (until is not None and day > until):
+            continue
+        yield {
+            "row": row,
+            "app": app,
+            "date": day,
+            "start": start,
+            "start_time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start)),
+            "duration": duration,
+            "resources": resources,
+        }
+
+
+def write_csv(rows, f):
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    last_row = 0
+    for record in rows:
+        # Nested resource summaries go in as a JSON string
+        if record["resources"] is not None:
+            record["resources"] = json.dumps(record["resources"])
+        writer.writerow(record)
+        last_row = record["row"]
+    return last_row
+
+
+def write_jsonl(rows, f):
+    last_row = 0
+    for record in rows:
+        f.write(json.dumps(record) + "\n")
+        last_row = record["row"]
+    return last_row
+
+
+def write_parquet(rows, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        ("row", pa.int64()), ("app", pa.string()), ("date", pa.string()), ("start", pa.int64()),
+        ("start_time", pa.string()), ("duration", pa.int64()), ("resources", pa.string()),
+    ])
+    last_row = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = {field: [] for field in FIELDS}
+
+        def flush():
+            if batch["row"]:
+                writer.write_table(pa.table(batch, schema=schema))
+                for column in batch.values():
+                    column.clear()
+
+        for record in rows:
+            if record["resources"] is not None:
+                record["resources"] = json.dumps(record["resources"])
+            for field in FIELDS:
+                batch[field].append(record[field])
+            last_row = record["row"]
+            if len(batch["row"]) >= BATCH_SIZE:
+                flush()
+        flush()
+    return last_row
+
+
+def read_state(path):
+    """Last row exported by a previous --since-last run"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get("row", 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_state(path, row):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"row": row}, f)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export recorded productivity timer sessions")
+    parser.add_argument("--format", choices=("csv", "jsonl", "parquet"), default="csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout, not for parquet)")
+    parser.add_argument("--app", help="only sessions of this app")
+    parser.add_argument("--since", type=date.fromisoformat, help="first local date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="last local date (YYYY-MM-DD)")
+    parser.add_argument("--since-last", nargs="?", const=STATE_PATH, metavar="STATE",
+                        help="only sessions recorded since the last --since-last export")
+    parser.add_argument("--store", choices=("journal", "sqlite"), help="storage backend to read")
+    args = parser.parse_args(argv)
+
+    if args.format == "parquet" and not args.output:
+        parser.error("parquet export needs --output")
+
+    store = open_store(args.store)
+    store.load_read_only()
+    after = read_state(args.since_last) if args.since_last else 0
+    rows = iter_export_rows(store, args.app, args.since, args.until, after)
+
+    if args.format == "parquet":
+        last_row = write_parquet(rows, args.output)
+    else:
+        writer = write_csv if args.format == "csv" else write_jsonl
+        if args.output:
+            with open(args.output, 'w', newline='') as f:
+                last_row = writer(rows, f)
+        else:
+            last_row = writer(rows, sys.stdout)
+
+    if args.since_last and last_row:
+        write_state(args.since_last, last_row)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
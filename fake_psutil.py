@@ -0,0 +1,188 @@
+"""Synthetic process table standing in for psutil, for the benchmarks
+
+Implements the part of the psutil API the detection code uses (Process,
+process_iter and the exception classes) over an in-memory table of a
+configurable size. A share of the processes deny access to their exe,
+and churn() replaces a share of them with new ones between scans.
+Install with install(table) before anything imports psutil.
+"""
+import sys
+import random
+from contextlib import contextmanager
+
+STATUS_RUNNING = "running"
+STATUS_ZOMBIE = "zombie"
+
+NAMES = (
+    "systemd", "bash", "zsh", "sshd", "python3", "node", "chrome", "firefox", "code",
+    "Xorg", "pulseaudio", "dbus-daemon", "gnome-shell", "kworker/0:1", "containerd",
+    "dockerd", "postgres", "nginx", "java", "slack", "electron", "tmux", "vim", "rustc",
+)
+
+
+class Error(Exception):
+    pass
+
+
+class NoSuchProcess(Error):
+    pass
+
+
+class AccessDenied(Error):
+    pass
+
+
+class ZombieProcess(NoSuchProcess):
+    pass
+
+
+class FakeProcess:
+    __slots__ = ("pid", "ppid", "name", "exe", "create_time", "denied")
+
+    def __init__(self, pid, ppid, name, exe, create_time, denied):
+        self.pid = pid
+        self.ppid = ppid
+        self.name = name
+        self.exe = exe
+        self.create_time = create_time
+        self.denied = denied
+
+
+class ProcessTable:
+    """count processes, denied_ratio of them hiding their exe
+
+    churn() replaces a churn share of the processes with new ones (new
+    PIDs and create times), the way short-lived processes come and go.
+    """
+
+    def __init__(self, count=1000, denied_ratio=0.1, churn=0.01, seed=0):
+        self.random = random.Random(seed)
+        self.denied_ratio = denied_ratio
+        self.churn_ratio = churn
+        self.clock = 1_700_000_000.0
+        self.next_pid = 1
+        self.processes = {}
+        # Never replaced by churn() (a running target app)
+        self.protected = set()
+        for _ in range(count):
+            self.spawn()
+
+    def spawn(self, name=None, exe=None, ppid=None, denied=None):
+        pid = self.next_pid
+        self.next_pid += 1
+        self.clock += 0.01
+        if name is None:
+            name = self.random.choice(NAMES)
+            exe = f"/usr/bin/{name.split('/')[0]}"
+        if ppid is None:
+            # Any earlier PID; it may have exited, like a reparented process
+            ppid = self.random.randrange(1, pid) if pid > 1 else 0
+        if denied is None:
+            denied = self.random.random() < self.denied_ratio
+        self.processes[pid] = FakeProcess(pid, ppid, name, exe, self.clock, denied)
+        return pid
+
+    def kill(self, pid):
+        self.processes.pop(pid, None)
+
+    def churn(self):
+        """Replace a churn share of the processes, returns how many were replaced"""
+        count = int(len(self.processes) * self.churn_ratio)
+        candidates = [pid for pid in self.processes if pid not in self.protected]
+        for pid in self.random.sample(candidates, min(count, len(candidates))):
+            self.kill(pid)
+        for _ in range(count):
+            self.spawn()
+        return count
+
+
+table = ProcessTable(0)
+
+
+def install(process_table):
+    """Make `import psutil` return this module, backed by process_table"""
+    global table
+    table = process_table
+    sys.modules["psutil"] = sys.modules[__name__]
+
+
+def lookup(pid):
+    proc = table.processes.get(pid)
+    if proc is None:
+        raise NoSuchProcess(pid)
+    return proc
+
+
+class Process:
+    def __init__(self, pid):
+        lookup(pid)
+        self.pid = pid
+        self.info = {}
+
+    def name(self):
+        return lookup(self.pid).name
+
+    def exe(self):
+        proc = lookup(self.pid)
+        if proc.denied:
+            raise AccessDenied(self.pid)
+        return proc.exe
+
+    def ppid(self):
+        return lookup(self.pid).ppid
+
+    def create_time(self):
+        return lookup(self.pid).create_time
+
+    def status(self):
+        lookup(self.pid)
+        return STATUS_RUNNING
+
+    def is_running(self):
+        return self.pid in table.processes
+
+    def cpu_percent(self, interval=None):
+        lookup(self.pid)
+        return 1.0
+
+    def memory_info(self):
+        lookup(self.pid)
+        return MemoryInfo(64 << 20)
+
+    def num_threads(self):
+        lookup(self.pid)
+        return 4
+
+    def children(self, recursive=False):
+        return [Process(proc.pid) for proc in list(table.processes.values()) if proc.ppid == self.pid]
+
+    @contextmanager
+    def oneshot(self):
+        yield
+
+
+class MemoryInfo:
+    def __init__(self, rss):
+        self.rss = rss
+
+
+def pids():
+    return list(table.processes)
+
+
+def pid_exists(pid):
+    return pid in table.processes
+
+
+def process_iter(attrs=None):
+    for proc in list(table.processes.values()):
+        process = Process.__new__(Process)
+        process.pid = proc.pid
+        process.info = {}
+        for attr in attrs or ():
+            if attr == "exe" and proc.denied:
+                value = None
+            else:
+                value = getattr(proc, attr)
+            process.info[attr] = value
+        yield process
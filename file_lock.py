@@ -0,0 +1,84 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: byte-range locks through msvcrt instead of flock
+    fcntl = None
+    import msvcrt
+
+
+def lock_fd(fd, blocking=True):
+    """Take an exclusive advisory lock on an open file, returns False if busy"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+
+    # msvcrt locks bytes from the current position; LK_LOCK gives up after
+    # about ten seconds, so keep asking until the lock is free
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+
+
+def unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Exclusive lock shared by every process (and thread) using one lock file
+
+    The operating system lock keeps other processes out; a re-entrant
+    thread lock does the same for other threads of this process, which
+    the OS lock on a shared descriptor would let through. Re-entrant, so
+    a method holding the lock can call another that takes it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.thread_lock = threading.RLock()
+        self.fd = None
+        self.depth = 0
+
+    def acquire(self, blocking=True):
+        if not self.thread_lock.acquire(blocking):
+            return False
+        if self.depth == 0:
+            try:
+                if self.fd is None:
+                    self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+                locked = lock_fd(self.fd, blocking)
+            except OSError:
+                self.thread_lock.release()
+                raise
+            if not locked:
+                self.thread_lock.release()
+                return False
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.depth == 0:
+            unlock_fd(self.fd)
+        self.thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,77 @@
+import os
+import json
+import socket
+
+# Unix domain socket the tracker daemon listens on
+SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".productivity_timer.sock")
+
+
+def encode(message):
+    """One JSON message per line"""
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+class LineReader:
+    """Splits a byte stream into JSON messages"""
+
+    def __init__(self):
+        self.buffer = b""
+
+    def feed(self, data):
+        """Add received bytes, return the complete messages"""
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b"\n")
+        messages = []
+        for line in lines:
+            if line.strip():
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    print(f"Ignoring malformed message: {line[:80]!r}")
+        return messages
+
+
+def connect(path=SOCKET_PATH, timeout=0.5):
+    """Connect to the daemon socket, returns None if nobody is listening"""
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def daemon_available(path=SOCKET_PATH):
+    """True if a tracker daemon is listening on path"""
+    sock = connect(path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def request(message, path=SOCKET_PATH, timeout=2.0):
+    """Send one request to the daemon and return its reply (None if unreachable)"""
+    sock = connect(path, timeout)
+    if sock is None:
+        return None
+
+    reader = LineReader()
+    try:
+        sock.sendall(encode(message))
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return None
+            for reply in reader.feed(data):
+                if "event" not in reply:
+                    return reply
+    except OSError:
+        return None
+    finally:
+        sock.close()
@@ -1,49 +1,143 @@
+import time
+STARTED = time.perf_counter()
+
+import os
 import sys
+from startup_timing import StartupTimer
+import metrics
+import single_instance
+
+timing = StartupTimer(STARTED)
+
+# A second launch hands its request to the running instance and exits
+# here, before Qt is imported or the data file is read
+if __name__ == "__main__":
+    launch = single_instance.launch_request(sys.argv[1:])
+    try:
+        instance = single_instance.claim(launch)
+    except (OSError, RuntimeError) as e:
+        print(f"Error contacting the running instance: {e}")
+        sys.exit(1)
+    if instance is None:
+        sys.exit(0)
+    timing.mark("single instance check")
+
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent, QSocketNotifier
+timing.mark("import Qt")
+
 from app_selector import AppSelectorPage
-from timer_page import TimerPage
 from app_state import AppState
+from ipc import daemon_available
+timing.mark("import app modules")
 
-def main():
-    # Create application instance 
-    app = QApplication(sys.argv)
-    
-    # Fix for Windows taskbar icon
-    import os
+
+class FirstPaint(QObject):
+    """Event filter that records the first paint of a window, then removes itself"""
+
+    def __init__(self, window, timing):
+        super().__init__(window)
+        self.timing = timing
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            self.timing.mark("first paint")
+            self.timing.report()
+        return False
+
+
+def set_windows_app_id(app):
+    """Give the app its own taskbar entry and icon on Windows"""
+    # Windows-only modules, imported only where they exist
     import ctypes
-    from PyQt5.QtWinExtras import QtWin  # Import Windows-specific module
+    from PyQt5.QtWinExtras import QtWin
     from PyQt5.QtGui import QIcon
-    
-    # Set app ID for Windows taskbar
+
+    # Create a unique app ID
+    app_id = 'company.productivitytimer.app.1.0'
+    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(app_id)
+
+    # Enable icon handling in taskbar
+    if os.path.exists("appicon.ico"):
+        # Force refresh icon cache using QtWin
+        QtWin.setCurrentProcessExplicitAppUserModelID(app_id)
+        app_icon = QIcon("appicon.ico")
+        app.setWindowIcon(app_icon)
+
+def main(instance, launch):
+    # Profiler, metrics dump and endpoint, if the environment asks for them
+    metrics.start()
+
+    # Create application instance
+    app = QApplication(sys.argv)
+
+    # Fix for Windows taskbar icon
     if os.name == 'nt':  # Windows
-        # Create a unique app ID
-        app_id = 'company.productivitytimer.app.1.0'
-        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(app_id)
-        
-        # Enable icon handling in taskbar
-        if os.path.exists("appicon.ico"):
-            # Force refresh icon cache using QtWin
-            QtWin.setCurrentProcessExplicitAppUserModelID(app_id)
-            app_icon = QIcon("appicon.ico")
-            app.setWindowIcon(app_icon)
-    
-    # Create shared app state
-    state = AppState()
-    
-    # Create both pages
+        set_windows_app_id(app)
+    timing.mark("QApplication")
+
+    # Create shared app state. If the tracker daemon is running it does the
+    # detection and records sessions, the GUI only displays them
+    if daemon_available():
+        from daemon_client import DaemonWatcher
+        state = AppState(records_sessions=False)
+        watcher = DaemonWatcher(state)
+    else:
+        state = AppState()
+        watcher = None
+    timing.mark("load app data")
+
     selector_page = AppSelectorPage(state)
-    timer_page = TimerPage(state)
-    
+    timing.mark("selector page")
+
+    # The timer page (and process detection, with psutil) is only built
+    # the first time it is needed
+    timer_page = None
+
+    def show_timer_page():
+        nonlocal timer_page
+        if timer_page is None:
+            build_start = time.perf_counter()
+            from timer_page import TimerPage
+            timer_page = TimerPage(state, watcher)
+            timer_page.navigate_to_selector.connect(selector_page.show)
+            timer_page.navigate_to_selector.connect(timer_page.hide)
+            timing.add("timer page (deferred)", time.perf_counter() - build_start)
+            timing.report()
+        timer_page.show()
+
     # Connect navigation signals
-    selector_page.navigate_to_timer.connect(timer_page.show)
+    selector_page.navigate_to_timer.connect(show_timer_page)
     selector_page.navigate_to_timer.connect(selector_page.hide)
-    timer_page.navigate_to_selector.connect(selector_page.show)
-    timer_page.navigate_to_selector.connect(timer_page.hide)
-    
+
+    def handle_launch(message):
+        """Act on a launch request, ours or one forwarded by a later launch"""
+        timer_visible = timer_page is not None and timer_page.isVisible()
+        if message.get("cmd") == "track":
+            if timer_visible:
+                timer_page.track(message["name"], message["path"])
+            else:
+                selector_page.select_app(message["name"], message["path"])
+        window = timer_page if timer_visible else selector_page
+        if window.isVisible():
+            window.showNormal()
+            window.raise_()
+            window.activateWindow()
+
+    # Later launches connect to us instead of starting their own instance
+    notifier = QSocketNotifier(instance.fileno(), QSocketNotifier.Read)
+    notifier.activated.connect(lambda: [handle_launch(message) for message in instance.accept()])
+    app.aboutToQuit.connect(instance.close)
+
     # Show initial page
+    if timing.enabled:
+        FirstPaint(selector_page, timing)
     selector_page.show()
-    
+    handle_launch(launch)
+
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(instance, launch)
@@ -0,0 +1,240 @@
+"""Merge the session histories of many machines into one store
+
+    python merge.py DIRECTORY -o OUTPUT [--store journal|sqlite] [--workers N]
+
+DIRECTORY holds one store per machine, under any base name: a journal
+store (NAME.json plus NAME.sessions / NAME.journal), a single-file data
+file from older versions, or a NAME.sqlite3 database. The stores are read
+in parallel by a process pool without being modified. Sessions of the
+same app whose time ranges overlap (the same session in two copies of a
+history, or double-counted time) are merged into one, and the result is
+written as a new store with its summary and rollups.
+
+When the stores belong to different people, whose sessions may overlap
+legitimately, --dedupe exact only drops sessions that are identical
+(same app, start and duration).
+"""
+import os
+import sys
+import time
+import argparse
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from session_table import SessionTable
+from storage import JournalStore, SqliteStore, add_to_rollups, empty_rollups
+from reports import local_offsets, day_to_date, DAY
+
+JOURNAL_SUFFIXES = (".json", ".sessions", ".journal")
+# Offset that keeps each app's times apart after sorting by (app, start)
+APP_STRIDE = 1 << 40
+
+
+def find_stores(directory):
+    """Paths to open for every store in directory (JSON data path or SQLite file)"""
+    stores = set()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".tmp") or name.endswith(".history.json") or not os.path.isfile(path):
+            continue
+        base, ext = os.path.splitext(path)
+        if ext == ".sqlite3":
+            stores.add(path)
+        elif ext in JOURNAL_SUFFIXES:
+            stores.add(base + ".json")
+    return sorted(stores)
+
+
+def read_store(path):
+    """Worker: (recent apps, app names, app id/start/duration column bytes, resources) of one store"""
+    if path.endswith(".sqlite3"):
+        recent_apps, table = read_sqlite(path)
+    else:
+        recent_apps, table = JournalStore(path).read_snapshot()
+    # Columns travel back as raw bytes, not as millions of pickled ints
+    return (recent_apps, table.apps, table.app_column.tobytes(), table.starts.tobytes(),
+            table.durations.tobytes(), table.resources)
+
+
+def read_sqlite(path):
+    store = SqliteStore(path, legacy_path=None)
+    store.load_read_only()
+    try:
+        table = SessionTable()
+        for _, app, start, duration, resources in store.iter_sessions():
+            table.append(app, start, duration, resources)
+        return store.app_data["recent_apps"], table
+    finally:
+        store.db.close()
+
+
+def merge_recent_apps(lists, limit=5):
+    merged = []
+    seen = set()
+    for recent_apps in lists:
+        for app in recent_apps:
+            if app["path"] not in seen:
+                seen.add(app["path"])
+                merged.append(app)
+    return merged[:limit]
+
+
+def dedupe(app_ids, starts, durations):
+    """Merge overlapping sessions of the same app
+
+    Returns (app ids, starts, durations, source row of each merged session)
+    where the source row is the longest session that went into it.
+    """
+    if not len(starts):
+        return app_ids, starts, durations, np.zeros(0, dtype=np.int64)
+
+    order = np.lexsort((starts, app_ids))
+    app_ids, starts, durations = app_ids[order], starts[order], durations[order]
+    ends = starts + durations
+
+    # Shift each app into its own range so one running maximum covers all apps
+    shift = app_ids.astype(np.int64) * APP_STRIDE
+    reach = np.maximum.accumulate(ends + shift)
+    new_group = np.ones(len(starts), dtype=bool)
+    new_group[1:] = starts[1:] + shift[1:] > reach[:-1]
+    first = np.flatnonzero(new_group)
+
+    merged_ends = np.maximum.reduceat(ends, first)
+    longest = np.maximum.reduceat(durations, first)
+    group = np.cumsum(new_group) - 1
+    source = np.flatnonzero(durations == longest[group])
+    _, keep = np.unique(group[source], return_index=True)
+    return app_ids[first], starts[first], merged_ends - starts[first], order[source[keep]]
+
+
+def dedupe_exact(app_ids, starts, durations):
+    """Drop sessions identical in app, start and duration, same return value as dedupe()"""
+    if not len(starts):
+        return app_ids, starts, durations, np.zeros(0, dtype=np.int64)
+
+    order = np.lexsort((durations, starts, app_ids))
+    app_ids, starts, durations = app_ids[order], starts[order], durations[order]
+    keep = np.ones(len(starts), dtype=bool)
+    keep[1:] = (app_ids[1:] != app_ids[:-1]) | (starts[1:] != starts[:-1]) | (durations[1:] != durations[:-1])
+    return app_ids[keep], starts[keep], durations[keep], order[keep]
+
+
+def build_statistics_vectorized(apps, app_ids, starts, durations):
+    """Same result as storage.build_statistics, grouped with NumPy first"""
+    statistics = {}
+    if not len(starts):
+        return statistics
+
+    days = (starts + local_offsets(starts)) // DAY
+    first_day = int(days.min())
+    span = int(days.max()) - first_day + 1
+    keys, inverse = np.unique(app_ids.astype(np.int64) * span + (days - first_day), return_inverse=True)
+    totals = np.bincount(inverse, weights=durations)
+
+    for key, total in zip(keys.tolist(), totals.tolist()):
+        app_id, day = divmod(key, span)
+        stats = statistics.setdefault(apps[app_id], {"total_time": 0, "rollups": empty_rollups()})
+        stats["total_time"] += int(total)
+        add_to_rollups(stats["rollups"], day_to_date(first_day + day).isoformat(), int(total))
+    return statistics
+
+
+def existing_output(output, store="journal"):
+    """Files of an existing store at output, which a merge would overwrite or replay"""
+    if store == "sqlite":
+        paths = [output]
+    else:
+        target = JournalStore(output)
+        paths = [output, target.history_path, target.json_history_path, target.journal_path, target.rotated_path]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def merge(directory, output, store="journal", workers=None, overlapping=True):
+    """Merge every store in directory into output, returns (stores, sessions read, sessions kept)"""
+    existing = existing_output(output, store)
+    if existing:
+        raise SystemExit(f"{existing[0]} already exists")
+    paths = find_stores(directory)
+    if not paths:
+        raise SystemExit(f"No session stores found in {directory}")
+
+    apps, app_index = [], {}
+    recent_lists, id_parts, start_parts, duration_parts, resources = [], [], [], [], {}
+    offset = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for recent_apps, names, app_column, starts, durations, file_resources in pool.map(read_store, paths):
+            recent_lists.append(recent_apps)
+            # Map this store's app ids onto the merged app list
+            for name in names:
+                if name not in app_index:
+                    app_index[name] = len(apps)
+                    apps.append(name)
+            mapping = np.array([app_index[name] for name in names], dtype=np.uint32)
+            id_parts.append(mapping[np.frombuffer(app_column, dtype=np.uint32)])
+            start_parts.append(np.frombuffer(starts, dtype=np.int64))
+            duration_parts.append(np.frombuffer(durations, dtype=np.uint32).astype(np.int64))
+            for row, summary in file_resources.items():
+                resources[offset + row] = summary
+            offset += len(start_parts[-1])
+
+    app_ids, starts, durations, source = (dedupe if overlapping else dedupe_exact)(
+        np.concatenate(id_parts), np.concatenate(start_parts), np.concatenate(duration_parts))
+
+    table = SessionTable()
+    for name in apps:
+        table.app_id(name)
+    table.app_column = array('I', app_ids.astype(np.uint32).tobytes())
+    table.starts = array('q', starts.astype(np.int64).tobytes())
+    table.durations = array('I', durations.astype(np.uint32).tobytes())
+    if resources:
+        rows = np.flatnonzero(np.isin(source, np.fromiter(resources, dtype=np.int64)))
+        table.resources = {int(row): resources[int(source[row])] for row in rows}
+
+    recent_apps = merge_recent_apps(recent_lists)
+    if store == "sqlite":
+        write_sqlite(output, recent_apps, table)
+    else:
+        counts = np.bincount(app_ids, minlength=len(apps))
+        statistics = build_statistics_vectorized(apps, app_ids, starts, durations)
+        summary = {name: {"total_time": statistics[name]["total_time"], "session_count": int(counts[i])}
+                   for i, name in enumerate(apps) if counts[i]}
+        write_journal(output, recent_apps, table, statistics, summary)
+    return len(paths), offset, len(table)
+
+
+def write_journal(output, recent_apps, table, statistics, summary):
+    target = JournalStore(output)
+    if not target.write_history({"sessions": table, "statistics": statistics}, 0):
+        raise SystemExit(f"Could not write {target.history_path}")
+    if not target.write_snapshot(output, {"recent_apps": recent_apps, "summary": summary}, 0):
+        raise SystemExit(f"Could not write {output}")
+
+
+def write_sqlite(output, recent_apps, table):
+    if os.path.exists(output):
+        raise SystemExit(f"{output} already exists")
+    target = SqliteStore(output, legacy_path=None)
+    target.connect()
+    target.import_sessions(recent_apps, table)
+    target.db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge session histories from many machines")
+    parser.add_argument("directory", help="directory with one store per machine")
+    parser.add_argument("-o", "--output", required=True, help="data file (journal) or database (sqlite) to write")
+    parser.add_argument("--store", choices=("journal", "sqlite"), default="journal", help="output store type")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--dedupe", choices=("overlap", "exact"), default="overlap",
+                        help="merge overlapping sessions of an app (default), or only drop identical ones")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stores, read, kept = merge(args.directory, args.output, args.store, args.workers, args.dedupe == "overlap")
+    print(f"Merged {stores} stores: {read} sessions read, {kept} after deduplication "
+          f"({time.perf_counter() - started:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Timing histograms for the hot paths, a periodic dump and a metrics endpoint
+
+Functions decorated with @timed(name) record how long each call took into
+a fixed-size histogram. Unless metrics are enabled the decorator returns
+the function unchanged, so there is no cost at all. Counters and current
+values (poll interval, scan counters, display wakeups) are published as
+gauges with set_gauges() by the thread that owns them, so the dump and
+the endpoint never read another thread's state. Configured through
+the environment:
+
+    PRODUCTIVITY_TIMER_METRICS=1            record the histograms
+    PRODUCTIVITY_TIMER_METRICS_DUMP=PATH    append a summary to PATH ("-" for stderr)
+                                            every PRODUCTIVITY_TIMER_METRICS_INTERVAL
+                                            seconds (default 60)
+    PRODUCTIVITY_TIMER_METRICS_LISTEN=ADDR  serve the histograms in the Prometheus
+                                            text format over HTTP, on HOST:PORT or
+                                            unix:/path/to/socket
+    PRODUCTIVITY_TIMER_PROFILE=MODE:PATH    profile the session and write the profile
+                                            to PATH on exit. cprofile: the main (GUI)
+                                            thread with cProfile, for pstats/snakeviz;
+                                            sample: every thread, sampled every 10 ms,
+                                            as collapsed stacks for flame graphs
+
+Setting the dump or the endpoint also enables the histograms.
+"""
+import os
+import re
+import sys
+import time
+import atexit
+import bisect
+import functools
+import threading
+
+PREFIX = "productivity_timer"
+# Upper bounds in seconds: 100 us doubling up to about 13 s
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(18))
+SAMPLE_INTERVAL = 0.01
+
+DUMP_PATH = os.environ.get("PRODUCTIVITY_TIMER_METRICS_DUMP", "")
+LISTEN = os.environ.get("PRODUCTIVITY_TIMER_METRICS_LISTEN", "")
+PROFILE = os.environ.get("PRODUCTIVITY_TIMER_PROFILE", "")
+ENABLED = (os.environ.get("PRODUCTIVITY_TIMER_METRICS", "") not in ("", "0")) or bool(DUMP_PATH or LISTEN)
+
+
+class Histogram:
+    """Call durations in fixed buckets, plus count, sum and maximum"""
+
+    def __init__(self, name, buckets=BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the maximum past the last bucket)"""
+        with self.lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, maximum)
+        return maximum
+
+    def prometheus(self):
+        metric = f"{PREFIX}_{self.name}_seconds"
+        with self.lock:
+            counts, count, total = list(self.counts), self.count, self.total
+        lines = [f"# HELP {metric} Time spent in {self.name}", f"# TYPE {metric} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{metric}_sum {total:.6f}")
+        lines.append(f"{metric}_count {count}")
+        return "\n".join(lines)
+
+    def summary(self):
+        if not self.count:
+            return f"{self.name:<20} no calls"
+        return (f"{self.name:<20} {self.count:>8} calls  avg {self.total / self.count * 1000:9.3f} ms  "
+                f"p50 <{self.quantile(0.5) * 1000:9.3f} ms  p99 <{self.quantile(0.99) * 1000:9.3f} ms  "
+                f"max {self.max * 1000:9.3f} ms")
+
+
+histograms = {}
+gauges = {}
+gauges_lock = threading.Lock()
+
+
+def histogram(name):
+    if name not in histograms:
+        histograms[name] = Histogram(name)
+    return histograms[name]
+
+
+def timed(name):
+    """Decorator recording each call's duration in the histogram name, when metrics are enabled"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        recorder = histogram(name)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def flatten(prefix, values, flat):
+    """Numbers of a (nested) stats dict as {prefix_key: value}; other values are skipped"""
+    for key, value in values.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{key}").lower()
+        if isinstance(value, dict):
+            flatten(name, value, flat)
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+
+
+def set_gauges(group, values):
+    """Publish the numbers of a stats dict as gauges named group_<key>"""
+    flat = {}
+    flatten(group, values, flat)
+    with gauges_lock:
+        gauges.update(flat)
+
+
+def prometheus_text():
+    lines = [h.prometheus() for _, h in sorted(histograms.items())]
+    with gauges_lock:
+        current = sorted(gauges.items())
+    for name, value in current:
+        metric = f"{PREFIX}_{name}"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value:g}"]
+    return "\n".join(lines) + "\n"
+
+
+def summary_text():
+    lines = [time.strftime("Metrics at %Y-%m-%d %H:%M:%S")]
+    lines += [h.summary() for _, h in sorted(histograms.items())]
+    with gauges_lock:
+        lines += [f"{name:<40} {value:g}" for name, value in sorted(gauges.items())]
+    return "\n".join(lines) + "\n"
+
+
+# --- periodic dump ---
+
+def dump(path=DUMP_PATH):
+    if path == "-":
+        sys.stderr.write(summary_text())
+        return
+    try:
+        with open(path, 'a') as f:
+            f.write(summary_text())
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+
+def dump_periodically(path, interval):
+    while True:
+        time.sleep(interval)
+        dump(path)
+
+
+# --- Prometheus endpoint ---
+
+def serve(listen):
+    """Start the endpoint on a daemon thread, returns the server"""
+    # Only imported when the endpoint is asked for, they are slow to import
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class UnixHTTPServer(socketserver.UnixStreamServer):
+        def server_bind(self):
+            if os.path.exists(self.server_address):
+                os.unlink(self.server_address)
+            super().server_bind()
+            os.chmod(self.server_address, 0o600)
+
+        def get_request(self):
+            # Unix socket clients have no address to log
+            request, _ = super().get_request()
+            return request, ("local", 0)
+
+    if listen.startswith("unix:"):
+        server = UnixHTTPServer(listen[len("unix:"):], MetricsHandler)
+    else:
+        host, _, port = listen.rpartition(":")
+        server = HTTPServer((host or "127.0.0.1", int(port)), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    return server
+
+
+# --- profiling ---
+
+class SamplingProfiler:
+    """Samples the stack of every thread, counted as collapsed stacks ("a;b;c count")"""
+
+    def __init__(self, path, interval=SAMPLE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stacks = {}
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        own = threading.get_ident()
+        while self.running:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        # Wait for the sampler's last pass, it may still be adding stacks
+        self.running = False
+        self.thread.join()
+        try:
+            with open(self.path, 'w') as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+
+
+def start_profile(spec):
+    mode, _, path = spec.partition(":")
+    if not path:
+        mode, path = "cprofile", spec
+    if mode == "sample":
+        profiler = SamplingProfiler(path)
+        profiler.start()
+        atexit.register(profiler.stop)
+        return profiler
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def write():
+        profiler.disable()
+        profiler.dump_stats(path)
+    atexit.register(write)
+    return profiler
+
+
+def start():
+    """Start whatever the environment asks for: dump thread, endpoint, profiler"""
+    if PROFILE:
+        start_profile(PROFILE)
+    if not ENABLED:
+        return
+    if DUMP_PATH:
+        interval = float(os.environ.get("PRODUCTIVITY_TIMER_METRICS_INTERVAL", "60"))
+        threading.Thread(target=dump_periodically, args=(DUMP_PATH, interval),
+                         name="metrics-dump", daemon=True).start()
+        # One last summary covering the whole session
+        atexit.register(dump)
+    if LISTEN:
+        try:
+            serve(LISTEN)
+        except (OSError, ValueError) as e:
+            print(f"Error starting metrics endpoint on {LISTEN}: {e}")
@@ -0,0 +1,290 @@
+import os
+import socket
+import struct
+import time
+import psutil
+
+# Netlink proc connector constants (linux/connector.h, linux/cn_proc.h)
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+NLMSGHDR = struct.Struct("=IHHII")
+CN_MSG = struct.Struct("=IIIIHH")
+PROC_EVENT_HEADER = struct.Struct("=IIQ")
+PROC_EVENT_PIDS = struct.Struct("=II")
+PROC_EVENT_FORK_PIDS = struct.Struct("=IIII")
+
+
+class DetectionStats:
+    """Start/stop latency and CPU time of a detection backend"""
+
+    def __init__(self, backend_name):
+        self.backend_name = backend_name
+        self.start_latencies = []
+        self.stop_latencies = []
+        self.cpu_time = 0.0
+        self.wakeups = 0
+        self.created = time.monotonic()
+
+    def record_start(self, create_time):
+        # How long after the process was created we noticed it
+        if create_time:
+            self.start_latencies.append(max(0.0, time.time() - create_time))
+
+    def record_stop(self, latency):
+        self.stop_latencies.append(max(0.0, latency))
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.created, 1e-9)
+
+        def summary(values):
+            if not values:
+                return None
+            return {"count": len(values), "avg": sum(values) / len(values), "max": max(values)}
+
+        return {
+            "backend": self.backend_name,
+            "start_latency": summary(self.start_latencies),
+            "stop_latency": summary(self.stop_latencies),
+            "cpu_time": self.cpu_time,
+            "cpu_percent": 100.0 * self.cpu_time / elapsed,
+            "wakeups": self.wakeups,
+        }
+
+
+class PollingBackend:
+    """Periodic psutil scans of the process table, available everywhere"""
+
+    name = "poll"
+
+    def __init__(self, scanner):
+        self.scanner = scanner
+
+    def close(self):
+        pass
+
+    def filenos(self):
+        """File descriptors that should wake the watcher when readable"""
+        return []
+
+    def needs_polling(self):
+        """Whether the watcher still has to poll on a timer"""
+        return True
+
+    def handle_readable(self, fd):
+        """Process a readable fd, return True if the target state may have changed"""
+        return False
+
+    def sync(self):
+        """Called after every check so the backend can follow the pinned PIDs"""
+        pass
+
+
+class EventBackend(PollingBackend):
+    """Linux event-driven detection
+
+    Exits of the pinned process are caught through a pidfd (pidfd_open +
+    poll), new execs through the netlink proc connector. The proc connector
+    needs CAP_NET_ADMIN; without it new processes are still found by polling,
+    but only while the target is not running. When the scanner follows
+    process trees, fork and exit events also keep its ProcessTree current.
+    """
+
+    name = "event"
+
+    def __init__(self, scanner):
+        super().__init__(scanner)
+        self.connector = open_proc_connector()
+        self.pidfds = {}
+        # Fork/exit events keep the scanner's process tree current between scans
+        scanner.tree_from_events = self.connector is not None
+
+    @staticmethod
+    def available():
+        return hasattr(os, "pidfd_open") or open_proc_connector(probe=True)
+
+    def close(self):
+        for pid in list(self.pidfds):
+            self.close_pidfd(pid)
+        if self.connector is not None:
+            self.connector.close()
+            self.connector = None
+
+    def filenos(self):
+        fds = list(self.pidfds.values())
+        if self.connector is not None:
+            fds.append(self.connector.fileno())
+        return fds
+
+    def needs_polling(self):
+        if self.scanner.tree is not None:
+            # Without fork events the process tree can only be followed by walking it
+            return self.connector is None
+        if not self.scanner.all_pinned():
+            # Only the proc connector can tell us about new processes
+            return self.connector is None
+        # Pidfds or EXIT events tell us when pinned processes go away
+        return self.connector is None and len(self.pidfds) < len(self.scanner.pinned)
+
+    def handle_readable(self, fd):
+        for pid, pidfd in self.pidfds.items():
+            if pidfd == fd:
+                # Pinned process exited
+                self.close_pidfd(pid)
+                self.scanner.unpin_pid(pid)
+                return True
+
+        if self.connector is not None and fd == self.connector.fileno():
+            return self.read_connector()
+
+        return False
+
+    def sync(self):
+        pinned = self.scanner.pinned_pids()
+        for pid in list(self.pidfds):
+            if pid not in pinned:
+                self.close_pidfd(pid)
+
+        if not hasattr(os, "pidfd_open"):
+            return
+
+        for key, (pid, create_time) in self.scanner.pinned.items():
+            if pid not in self.pidfds:
+                self.open_pidfd(pid, create_time)
+
+    def open_pidfd(self, pid, create_time):
+        try:
+            pidfd = os.pidfd_open(pid)
+        except OSError:
+            return
+
+        # Make sure the PID was not reused between the check and pidfd_open
+        try:
+            if psutil.Process(pid).create_time() != create_time:
+                os.close(pidfd)
+                return
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            os.close(pidfd)
+            return
+
+        self.pidfds[pid] = pidfd
+
+    def close_pidfd(self, pid):
+        pidfd = self.pidfds.pop(pid, None)
+        if pidfd is not None:
+            os.close(pidfd)
+
+    def read_connector(self):
+        changed = False
+        while True:
+            try:
+                data = self.connector.recv(4096, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            except OSError:
+                # ENOBUFS means we missed events, force a rescan
+                self.scanner.pinned.clear()
+                self.scanner.tree_synced = False
+                return True
+
+            pinned = self.scanner.pinned_pids()
+            for what, pid, tgid, child in parse_proc_events(data):
+                if what == PROC_EVENT_FORK:
+                    if child and self.scanner.tree is not None:
+                        self.scanner.tree.add(child, tgid)
+                    continue
+                if what == PROC_EVENT_EXIT and pid == tgid and self.scanner.tree is not None:
+                    self.scanner.tree.remove(pid)
+
+                if what == PROC_EVENT_EXEC:
+                    if self.scanner.check_candidate(tgid):
+                        pinned = self.scanner.pinned_pids()
+                        changed = True
+                elif what == PROC_EVENT_EXIT and pid == tgid and pid in pinned:
+                    # Only the thread group leader exiting means the process is gone
+                    self.close_pidfd(pid)
+                    self.scanner.unpin_pid(pid)
+                    del pinned[pid]
+                    changed = True
+
+        return changed
+
+
+def open_proc_connector(probe=False):
+    """Subscribe to proc connector events, returns None if not permitted"""
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+    except OSError:
+        return None
+
+    try:
+        # Bursts of fork/exit events (e.g. a build) overflow the default buffer
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    except OSError:
+        pass
+
+    try:
+        sock.bind((0, CN_IDX_PROC))
+        op = struct.pack("=I", PROC_CN_MCAST_LISTEN)
+        cn_msg = CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op), 0) + op
+        header = NLMSGHDR.pack(NLMSGHDR.size + len(cn_msg), NLMSG_DONE, 0, 0, 0)
+        sock.send(header + cn_msg)
+    except OSError:
+        sock.close()
+        return None
+
+    if probe:
+        sock.close()
+        return True
+    return sock
+
+
+def parse_proc_events(data):
+    """Yield (what, pid, tgid, child_tgid) for each proc event in a netlink datagram
+
+    For fork events pid/tgid are the parent's and child_tgid is the new
+    process (0 when a thread was created), otherwise child_tgid is 0.
+    """
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        msg_len, msg_type, _, _, _ = NLMSGHDR.unpack_from(data, offset)
+        if msg_len < NLMSGHDR.size:
+            break
+
+        body = offset + NLMSGHDR.size + CN_MSG.size
+        if body + PROC_EVENT_HEADER.size + PROC_EVENT_PIDS.size <= offset + msg_len:
+            what, _, _ = PROC_EVENT_HEADER.unpack_from(data, body)
+            pids = body + PROC_EVENT_HEADER.size
+            child = 0
+            if what == PROC_EVENT_FORK and pids + PROC_EVENT_FORK_PIDS.size <= offset + msg_len:
+                pid, tgid, child_pid, child_tgid = PROC_EVENT_FORK_PIDS.unpack_from(data, pids)
+                if child_pid == child_tgid:
+                    child = child_tgid
+            else:
+                pid, tgid = PROC_EVENT_PIDS.unpack_from(data, pids)
+            yield what, pid, tgid, child
+
+        # Netlink messages are 4-byte aligned
+        offset += (msg_len + 3) & ~3
+
+
+def create_backend(kind, scanner):
+    """Create a detection backend: "poll", "event" or "auto"""
+    kind = (kind or "auto").lower()
+    if kind in ("event", "auto") and EventBackend.available():
+        return EventBackend(scanner)
+
+    if kind == "event":
+        print("Event-driven process detection not available, falling back to polling")
+    elif kind not in ("poll", "auto"):
+        print(f"Unknown detection backend '{kind}', using polling")
+    return PollingBackend(scanner)
@@ -0,0 +1,162 @@
+import os
+import time
+from process_scanner import ProcessScanner
+from process_backends import DetectionStats, create_backend
+from metrics import timed
+
+
+def env_ms(name, default):
+    """Milliseconds from an environment variable, default if unset or invalid"""
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+class AdaptiveInterval:
+    """Poll interval that backs off while nothing changes
+
+    Each quiet check multiplies the interval by backoff, up to max_ms. A
+    state change or user interaction snaps it back to min_ms. The interval
+    never exceeds latency_ms, the worst-case time to notice a start or stop.
+    Defaults come from PRODUCTIVITY_TIMER_POLL_MIN_MS, _POLL_MAX_MS and
+    _POLL_LATENCY_MS.
+    """
+
+    def __init__(self, min_ms=None, max_ms=None, latency_ms=None, backoff=2.0):
+        self.min_ms = min_ms or env_ms("PRODUCTIVITY_TIMER_POLL_MIN_MS", 1000)
+        self.max_ms = max_ms or env_ms("PRODUCTIVITY_TIMER_POLL_MAX_MS", 8000)
+        self.latency_ms = latency_ms or env_ms("PRODUCTIVITY_TIMER_POLL_LATENCY_MS", 5000)
+        self.backoff = backoff
+        self.current_ms = self.min_ms
+
+        # How many checks ran at each interval, to chart what backing off saves
+        self.checks = 0
+        self.resets = 0
+
+    def ceiling(self):
+        return max(self.min_ms, min(self.max_ms, self.latency_ms))
+
+    def reset(self):
+        """Poll fast again"""
+        if self.current_ms != self.min_ms:
+            self.resets += 1
+        self.current_ms = self.min_ms
+
+    def update(self, changed):
+        """Next interval after a check, changed is whether the check saw a change"""
+        self.checks += 1
+        if changed:
+            self.reset()
+        else:
+            self.current_ms = min(self.ceiling(), int(self.current_ms * self.backoff))
+        return self.current_ms
+
+    def stats(self):
+        return {
+            "poll_interval_ms": self.current_ms,
+            "poll_min_ms": self.min_ms,
+            "poll_max_ms": self.ceiling(),
+            "poll_checks": self.checks,
+            "poll_resets": self.resets,
+        }
+
+
+class TargetMonitor:
+    """Detection state for a set of tracked apps, independent of any event loop
+
+    The caller owns the loop: it calls check() when the poll interval
+    expires and handle_readable() when one of filenos() becomes readable.
+    Both return the (target key, running) changes since the last check.
+    Used by the GUI's ProcessWatcher thread and by the headless daemon.
+    With track_tree (or PRODUCTIVITY_TIMER_TRACK_CHILDREN=1) an app counts as
+    running while any descendant of its matched process is alive.
+    """
+
+    def __init__(self, backend=None, interval=None, track_tree=None):
+        if track_tree is None:
+            track_tree = os.environ.get("PRODUCTIVITY_TIMER_TRACK_CHILDREN", "") not in ("", "0")
+        self.scanner = ProcessScanner(track_tree=track_tree)
+        self.backend = create_backend(
+            backend or os.environ.get("PRODUCTIVITY_TIMER_DETECTION", "auto"), self.scanner)
+        self.detection_stats = DetectionStats(self.backend.name)
+        self.interval = interval if interval is not None else AdaptiveInterval()
+        self.running = None
+        self.last_alive = {}
+
+    def set_targets(self, target_paths):
+        self.scanner.set_targets(target_paths)
+        self.running = None
+        self.last_alive = {}
+        self.interval.reset()
+        self.backend.sync()
+
+    def has_targets(self):
+        return bool(self.scanner.targets)
+
+    def needs_polling(self):
+        return self.has_targets() and self.backend.needs_polling()
+
+    def filenos(self):
+        return self.backend.filenos()
+
+    def poll_interval(self):
+        """Milliseconds until the next poll should run"""
+        return self.interval.current_ms
+
+    def interact(self):
+        """The user did something, poll fast for a while"""
+        self.interval.reset()
+
+    @timed("scan")
+    def check(self, event_time=None):
+        """Look at the process table, return the list of (key, running) changes"""
+        cpu_start = time.thread_time()
+        self.detection_stats.wakeups += 1
+        running = self.scanner.running_targets()
+        self.backend.sync()
+
+        now = time.monotonic()
+        previous = self.running
+        self.running = running
+        changes = []
+        for key in sorted(self.scanner.targets):
+            app_running = key in running
+            if previous is not None and app_running == (key in previous):
+                continue
+
+            if previous is not None:
+                if app_running:
+                    self.detection_stats.record_start(self.scanner.pinned[key][1])
+                else:
+                    # Upper bound: last time we saw it alive, or when the exit event arrived
+                    self.detection_stats.record_stop(now - (event_time or self.last_alive.get(key, now)))
+            changes.append((key, app_running))
+
+        for key in running:
+            self.last_alive[key] = now
+
+        self.interval.update(bool(changes) and previous is not None)
+        self.detection_stats.cpu_time += time.thread_time() - cpu_start
+        return changes
+
+    def handle_readable(self, fd):
+        """Handle a readable backend fd, return the list of (key, running) changes"""
+        cpu_start = time.thread_time()
+        event_time = time.monotonic()
+        changed = self.backend.handle_readable(fd)
+        self.detection_stats.cpu_time += time.thread_time() - cpu_start
+        if not changed:
+            self.detection_stats.wakeups += 1
+            return []
+        return self.check(event_time)
+
+    def close(self):
+        self.backend.close()
+
+    def stats(self):
+        """Return scan counters plus latency/CPU figures for the active backend"""
+        stats = self.scanner.stats()
+        stats.update(self.detection_stats.report())
+        stats.update(self.interval.stats())
+        return stats
@@ -0,0 +1,285 @@
+import time
+from collections import OrderedDict
+import psutil
+from process_tree import ProcessTree
+from targets import target_key
+
+
+class ExeCache:
+    """Bounded LRU of resolved exe paths keyed by (pid, create_time)
+
+    Resolving exe is a readlink per process (and often AccessDenied), while
+    a process's exe never changes, so it is resolved once per process.
+    Entries are dropped when their process is seen to be gone, so the
+    bound only has to be larger than the process table.
+    """
+
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.denied = 0
+
+    def get(self, proc, pid, create_time):
+        """Resolved exe of proc, or None if it cannot be read"""
+        ident = (pid, create_time)
+        if ident in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(ident)
+            return self.entries[ident]
+
+        self.misses += 1
+        try:
+            exe = proc.exe()
+        except psutil.AccessDenied:
+            # Cached too: asking again would only raise again
+            self.denied += 1
+            exe = None
+        self.entries[ident] = exe
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return exe
+
+    def discard_pid(self, pid):
+        for ident in [ident for ident in self.entries if ident[0] == pid]:
+            del self.entries[ident]
+
+    def retain(self, live):
+        """Drop entries whose (pid, create_time) is not in live"""
+        for ident in [ident for ident in self.entries if ident not in live]:
+            del self.entries[ident]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "exe_cache_size": len(self.entries),
+            "exe_cache_hits": self.hits,
+            "exe_cache_misses": self.misses,
+            "exe_cache_denied": self.denied,
+            "exe_cache_hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+class ProcessScanner:
+    """Looks up the tracked executables in the process table
+
+    Targets are indexed by lowercase exe basename so a single walk over the
+    process table serves every target, with one hash lookup per process.
+    Once a matching process is found its PID is pinned (together with its
+    create_time so a reused PID is not mistaken for it) and later checks
+    only look at that one process. The full process table is walked again
+    only while some target has no live pinned process. Process names are
+    not used: a program started through a symlink of another name
+    ("editor" running nano) is still found by its exe, which ExeCache
+    resolves once per process rather than on every walk.
+
+    With track_tree, a target also counts as running while any descendant
+    of a matched process is alive (launchers that exit and leave their
+    children running). When the pinned process dies a live descendant from
+    the ProcessTree index is pinned instead. The tree is kept current by
+    fork/exit events when the backend has them (tree_from_events), else by
+    walking the process table on every check.
+    """
+
+    def __init__(self, exe_cache_size=65536, track_tree=False):
+        self.targets = set()
+        self.pinned = {}
+        self.exe_cache = ExeCache(exe_cache_size)
+        self.tree = ProcessTree() if track_tree else None
+        self.tree_from_events = False
+        self.tree_synced = False
+
+        # Counters for how the targets were checked
+        self.full_scans = 0
+        self.pinned_checks = 0
+        self.matches = 0
+        self.exceptions = {}
+        self.scan_time_total = 0.0
+        self.scan_time_last = 0.0
+        self.scan_time_max = 0.0
+
+    def set_target(self, target_path):
+        """Track a single executable"""
+        self.set_targets([target_path] if target_path else [])
+
+    def set_targets(self, target_paths):
+        """Set the executables to look for"""
+        self.targets = {target_key(path) for path in target_paths if path}
+        self.pinned = {key: pin for key, pin in self.pinned.items() if key in self.targets}
+        if self.tree is not None:
+            self.tree.retain(self.targets)
+
+    def pin(self, key, pid, create_time):
+        self.pinned[key] = (pid, create_time)
+        if self.tree is not None:
+            self.tree.track(key, pid, create_time)
+
+    def unpin(self, key):
+        self.pinned.pop(key, None)
+
+    def unpin_pid(self, pid):
+        self.exe_cache.discard_pid(pid)
+        for key, (pinned_pid, _) in list(self.pinned.items()):
+            if pinned_pid == pid:
+                del self.pinned[key]
+
+    def pinned_pids(self):
+        return {pid: key for key, (pid, _) in self.pinned.items()}
+
+    def all_pinned(self):
+        return len(self.pinned) == len(self.targets)
+
+    def is_target_running(self):
+        """Return True if any tracked executable is running"""
+        return bool(self.running_targets())
+
+    def running_targets(self):
+        """Return the set of target keys that currently have a live process"""
+        running = set()
+        walked = False
+        if self.tree is not None and not (self.tree_from_events and self.tree_synced):
+            # Exited parents' children get reparented, so the tree has to be
+            # followed before the parent is gone
+            running |= self.full_scan(self.targets - set(self.pinned))
+            walked = True
+
+        for key, (pid, create_time) in list(self.pinned.items()):
+            if key in running:
+                continue
+            if self.check_pinned(pid, create_time):
+                running.add(key)
+            else:
+                del self.pinned[key]
+
+        if self.tree is not None:
+            for key in self.targets - running:
+                if self.pin_descendant(key):
+                    running.add(key)
+
+        missing = self.targets - running
+        if missing and not walked:
+            running |= self.full_scan(missing)
+        return running
+
+    def pin_descendant(self, key):
+        """Pin a live descendant of key's matched process, if there is one"""
+        while True:
+            entry = self.tree.descendant(key)
+            if entry is None:
+                return False
+            pid, create_time = entry
+            try:
+                if create_time is None:
+                    create_time = psutil.Process(pid).create_time()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+                self.count_exception(e)
+                self.tree.remove(pid)
+                continue
+
+            if self.check_pinned(pid, create_time):
+                self.pinned[key] = (pid, create_time)
+                return True
+            self.tree.remove(pid)
+
+    def check_pinned(self, pid, create_time):
+        """Return True if the pinned process is still alive"""
+        self.pinned_checks += 1
+        try:
+            proc = psutil.Process(pid)
+            if proc.create_time() != create_time:
+                # PID was reused by another process
+                return False
+            return proc.status() != psutil.STATUS_ZOMBIE
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+            self.count_exception(e)
+            return False
+
+    def check_candidate(self, pid):
+        """Check a single new process (e.g. from an exec event) and pin it if it matches"""
+        if self.all_pinned():
+            return False
+        missing = self.targets - set(self.pinned)
+        try:
+            proc = psutil.Process(pid)
+            create_time = proc.create_time()
+            key = self.match(proc, pid, create_time, missing)
+            if key is not None:
+                self.pin(key, pid, create_time)
+                return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+            self.count_exception(e)
+        return False
+
+    def match(self, proc, pid, create_time, missing):
+        """Target key proc is running if it is one of missing, else None"""
+        key = target_key(self.exe_cache.get(proc, pid, create_time))
+        if key in missing:
+            self.matches += 1
+            return key
+        return None
+
+    def full_scan(self, missing):
+        """Walk the process table once and pin the first match for each missing target"""
+        self.full_scans += 1
+        scan_start = time.perf_counter()
+        found = set()
+        live = set()
+        complete = True
+        tree_entries = [] if self.tree is not None else None
+        remaining = set(missing)
+        attrs = ['pid', 'create_time'] if tree_entries is None else ['pid', 'ppid', 'create_time']
+        for proc in psutil.process_iter(attrs):
+            try:
+                pid, create_time = proc.info['pid'], proc.info['create_time']
+                live.add((pid, create_time))
+                if tree_entries is not None:
+                    tree_entries.append((pid, proc.info['ppid'], create_time))
+                key = self.match(proc, pid, create_time, remaining)
+                if key is not None:
+                    remaining.discard(key)
+                    self.pin(key, pid, create_time)
+                    found.add(key)
+                    if len(found) == len(missing) and tree_entries is None:
+                        complete = False
+                        break
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
+                self.count_exception(e)
+
+        # Only a complete walk tells us which cached processes are gone
+        if complete:
+            self.exe_cache.retain(live)
+        if tree_entries is not None:
+            self.tree.sync(tree_entries)
+            self.tree_synced = True
+
+        elapsed = time.perf_counter() - scan_start
+        self.scan_time_last = elapsed
+        self.scan_time_total += elapsed
+        self.scan_time_max = max(self.scan_time_max, elapsed)
+        return found
+
+    def count_exception(self, e):
+        name = type(e).__name__
+        self.exceptions[name] = self.exceptions.get(name, 0) + 1
+
+    def stats(self):
+        """Return the scan counters, exception counts, exe cache and scan time figures"""
+        exceptions = dict(self.exceptions)
+        if self.exe_cache.denied:
+            # Denied exe lookups are caught by the cache, not by the scan
+            exceptions["AccessDenied"] = exceptions.get("AccessDenied", 0) + self.exe_cache.denied
+        stats = {
+            "full_scans": self.full_scans,
+            "pinned_checks": self.pinned_checks,
+            "pinned_pids": sorted(self.pinned_pids()),
+            "matches": self.matches,
+            "exceptions": exceptions,
+            "scan_time_last": self.scan_time_last,
+            "scan_time_avg": self.scan_time_total / self.full_scans if self.full_scans else None,
+            "scan_time_max": self.scan_time_max,
+        }
+        stats.update(self.exe_cache.stats())
+        if self.tree is not None:
+            stats.update(self.tree.stats())
+        return stats
@@ -0,0 +1,126 @@
+class ProcessTree:
+    """Incrementally maintained parent/child index of the process table
+
+    Processes are added and removed one at a time, from proc connector
+    fork/exit events or by diffing a walk of the process table against what
+    is already known (sync), so the index is never rebuilt. Each process
+    that descends from a matched target process is owned by that target's
+    key, and ownership is handed to new children when they are added, so
+    asking whether a target still has a live descendant costs the same with
+    one child or hundreds.
+    """
+
+    def __init__(self):
+        self.procs = {}     # pid -> (ppid, create_time or None)
+        self.children = {}  # ppid -> set of child pids
+        self.owner = {}     # pid -> target key it counts for
+        self.members = {}   # target key -> set of owned pids
+
+        # Index updates, to check the cost stays proportional to churn
+        self.added = 0
+        self.removed = 0
+
+    def __len__(self):
+        return len(self.procs)
+
+    def add(self, pid, ppid, create_time=None):
+        """A process appeared (fork event or newly seen in a walk)"""
+        if pid in self.procs:
+            self.remove(pid)
+        self.added += 1
+        self.procs[pid] = (ppid, create_time)
+        self.children.setdefault(ppid, set()).add(pid)
+
+        key = self.owner.get(ppid)
+        if key is not None:
+            self.adopt(pid, key)
+
+    def remove(self, pid):
+        """A process exited; its children keep their owner"""
+        entry = self.procs.pop(pid, None)
+        if entry is None:
+            return
+        self.removed += 1
+
+        siblings = self.children.get(entry[0])
+        if siblings is not None:
+            siblings.discard(pid)
+            if not siblings:
+                del self.children[entry[0]]
+        self.children.pop(pid, None)
+
+        key = self.owner.pop(pid, None)
+        if key is not None:
+            self.members[key].discard(pid)
+
+    def reparent(self, pid, ppid):
+        old_ppid, create_time = self.procs[pid]
+        siblings = self.children.get(old_ppid)
+        if siblings is not None:
+            siblings.discard(pid)
+            if not siblings:
+                del self.children[old_ppid]
+        self.procs[pid] = (ppid, create_time)
+        self.children.setdefault(ppid, set()).add(pid)
+
+    def sync(self, entries):
+        """Apply the difference between the index and a walk of (pid, ppid, create_time)"""
+        seen = set()
+        for pid, ppid, create_time in entries:
+            seen.add(pid)
+            known = self.procs.get(pid)
+            if known is None or (known[1] is not None and known[1] != create_time):
+                # New process, or the PID was reused
+                self.add(pid, ppid, create_time)
+                continue
+            if known[1] is None:
+                self.procs[pid] = (known[0], create_time)
+            if known[0] != ppid:
+                self.reparent(pid, ppid)
+
+        for pid in self.procs.keys() - seen:
+            self.remove(pid)
+
+    def adopt(self, pid, key):
+        """Make pid and everything below it count for key"""
+        members = self.members.setdefault(key, set())
+        stack = [pid]
+        while stack:
+            current = stack.pop()
+            if self.owner.get(current) == key or current not in self.procs:
+                continue
+            self.owner[current] = key
+            members.add(current)
+            stack.extend(self.children.get(current, ()))
+
+    def track(self, key, pid, create_time):
+        """Start counting descendants of a matched target process"""
+        if pid not in self.procs:
+            self.procs[pid] = (0, create_time)
+            self.children.setdefault(0, set()).add(pid)
+        self.adopt(pid, key)
+
+    def untrack(self, key):
+        for pid in self.members.pop(key, ()):
+            self.owner.pop(pid, None)
+
+    def retain(self, keys):
+        """Forget ownership for every key not in keys"""
+        for key in list(self.members):
+            if key not in keys:
+                self.untrack(key)
+
+    def descendant(self, key, exclude=None):
+        """Some live (pid, create_time) owned by key, or None"""
+        for pid in self.members.get(key, ()):
+            if pid != exclude:
+                return pid, self.procs[pid][1]
+        return None
+
+    def stats(self):
+        return {
+            "tree_processes": len(self.procs),
+            "tree_members": {key: len(pids) for key, pids in self.members.items()},
+            "tree_added": self.added,
+            "tree_removed": self.removed,
+        }
@@ -0,0 +1,192 @@
+from PyQt5.QtCore import QObject, QThread, QTimer, QSocketNotifier, pyqtSignal, pyqtSlot
+from process_monitor import TargetMonitor, AdaptiveInterval
+from resource_sampler import ResourceSampler, SAMPLE_INTERVAL_MS
+import metrics
+
+
+class ProcessWatcher(QObject):
+    """Watches for the tracked apps on a worker thread and reports state changes
+
+    Detection uses the backend selected by the PRODUCTIVITY_TIMER_DETECTION
+    environment variable ("auto", "event" or "poll"). Event-driven backends
+    hand us file descriptors that wake the worker thread; the poll timer only
+    runs while the backend still needs it, and backs off while nothing
+    changes (see AdaptiveInterval).
+
+    The resource usage of a running target is sampled here too, from the
+    process detection pinned, so psutil is only ever called on the worker
+    thread. Each sample sends the session's summary so far.
+    """
+
+    # Emitted only when a tracked app (by target key) starts (True) or stops (False)
+    target_status_changed = pyqtSignal(str, bool)
+
+    # Resource summary (see SampleRing.summary) of a sampling session, after each sample
+    resources_sampled = pyqtSignal(int, object)
+
+    def __init__(self, interval=None, backend=None):
+        super().__init__()
+        self.interval = interval
+        self.backend_kind = backend
+        self.monitor = None
+        self.poll_timer = None
+        self.notifiers = {}
+
+        self.sampler = ResourceSampler()
+        self.sample_timer = None
+        self.sample_key = None
+        self.sample_session = None
+
+    @pyqtSlot(list)
+    def watch(self, target_paths):
+        """Start watching for target_paths (runs on the worker thread)"""
+        # Created lazily so the timer and backend belong to the worker thread
+        if self.poll_timer is None:
+            self.poll_timer = QTimer(self)
+            self.poll_timer.timeout.connect(self.poll)
+            self.monitor = TargetMonitor(self.backend_kind, AdaptiveInterval(min_ms=self.interval))
+
+        self.monitor.set_targets(target_paths)
+        self.poll()
+
+    @pyqtSlot()
+    def unwatch(self):
+        """Stop watching"""
+        if self.monitor is None:
+            return
+        self.poll_timer.stop()
+        self.monitor.set_targets([])
+        self.update_notifiers()
+
+    @pyqtSlot()
+    def interact(self):
+        """Poll now and keep polling fast after user interaction"""
+        if self.monitor is None or not self.monitor.has_targets():
+            return
+        self.monitor.interact()
+        self.poll()
+
+    @pyqtSlot(str, int)
+    def start_sampling(self, key, session):
+        """Sample the process pinned for key, continuing session or starting a new one"""
+        if SAMPLE_INTERVAL_MS <= 0:
+            return
+        if self.sample_timer is None:
+            self.sample_timer = QTimer(self)
+            self.sample_timer.timeout.connect(self.sample)
+            self.sample_timer.setInterval(SAMPLE_INTERVAL_MS)
+        if session != self.sample_session:
+            self.sampler.finish_session()
+            self.sample_session = session
+        self.sample_key = key
+        self.sample_timer.start()
+
+    @pyqtSlot()
+    def stop_sampling(self):
+        if self.sample_timer is not None:
+            self.sample_timer.stop()
+
+    @pyqtSlot()
+    def sample(self):
+        pinned = self.monitor.scanner.pinned.get(self.sample_key) if self.monitor is not None else None
+        if self.sampler.sample(pinned):
+            self.resources_sampled.emit(self.sample_session, self.sampler.ring.summary())
+
+    @pyqtSlot()
+    def poll(self):
+        self.emit_changes(self.monitor.check())
+
+    def on_fd_readable(self, fd):
+        self.emit_changes(self.monitor.handle_readable(fd))
+
+    def emit_changes(self, changes):
+        for key, app_running in changes:
+            self.target_status_changed.emit(key, app_running)
+        self.update_schedule()
+
+    def update_schedule(self):
+        """Only keep the poll timer running while the backend needs it"""
+        if metrics.ENABLED:
+            # Published from this thread, the only one touching the monitor
+            metrics.set_gauges("detection", self.stats())
+        self.update_notifiers()
+        if self.monitor.needs_polling():
+            # (Re)arming after every check picks up the adaptive interval
+            self.poll_timer.start(self.monitor.poll_interval())
+        else:
+            self.poll_timer.stop()
+
+    def update_notifiers(self):
+        fds = set(self.monitor.filenos())
+        for fd in list(self.notifiers):
+            if fd not in fds:
+                notifier = self.notifiers.pop(fd)
+                notifier.setEnabled(False)
+                notifier.deleteLater()
+
+        for fd in fds:
+            if fd not in self.notifiers:
+                notifier = QSocketNotifier(fd, QSocketNotifier.Read, self)
+                notifier.activated.connect(lambda _, fd=fd: self.on_fd_readable(fd))
+                self.notifiers[fd] = notifier
+
+    def stats(self):
+        """Return scan counters plus latency/CPU figures for the active backend"""
+        stats = self.monitor.stats() if self.monitor is not None else {}
+        stats.update(("sampler_" + name, value) for name, value in self.sampler.stats().items())
+        return stats
+
+
+class ProcessWatcherThread(QObject):
+    """Owns a ProcessWatcher and the QThread it runs on"""
+
+    target_status_changed = pyqtSignal(str, bool)
+    resources_sampled = pyqtSignal(int, object)
+
+    # Queued into the worker thread
+    watch_requested = pyqtSignal(list)
+    unwatch_requested = pyqtSignal()
+    interact_requested = pyqtSignal()
+    start_sampling_requested = pyqtSignal(str, int)
+    stop_sampling_requested = pyqtSignal()
+
+    def __init__(self, parent=None, interval=None, backend=None):
+        super().__init__(parent)
+        self.thread = QThread()
+        self.watcher = ProcessWatcher(interval, backend)
+        self.watcher.moveToThread(self.thread)
+
+        self.watch_requested.connect(self.watcher.watch)
+        self.unwatch_requested.connect(self.watcher.unwatch)
+        self.interact_requested.connect(self.watcher.interact)
+        self.start_sampling_requested.connect(self.watcher.start_sampling)
+        self.stop_sampling_requested.connect(self.watcher.stop_sampling)
+        self.watcher.target_status_changed.connect(self.target_status_changed)
+        self.watcher.resources_sampled.connect(self.resources_sampled)
+
+        self.thread.start()
+
+    def watch(self, target_paths):
+        self.watch_requested.emit(list(target_paths))
+
+    def unwatch(self):
+        self.unwatch_requested.emit()
+
+    def interact(self):
+        """Tell the watcher the user is active so it polls fast again"""
+        self.interact_requested.emit()
+
+    def start_sampling(self, key, session):
+        """Sample the resource usage of target key's process, for session"""
+        self.start_sampling_requested.emit(key, session)
+
+    def stop_sampling(self):
+        self.stop_sampling_requested.emit()
+
+    def shutdown(self):
+        """Stop the worker thread and wait for it to exit"""
+        self.unwatch()
+        self.thread.quit()
+        self.thread.wait()
+        if self.watcher.monitor is not None:
+            self.watcher.monitor.close()
@@ -0,0 +1,292 @@
+"""Usage reports over the recorded session history
+
+Sessions are loaded into NumPy arrays, one per column, straight from the
+SessionTable buffers, and every report is computed with vectorized
+operations, so a history of a million sessions is reported on in a
+fraction of a second.
+
+    python reports.py [--app NAME] [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--json]
+"""
+import sys
+import json
+import time
+import argparse
+from datetime import date, timedelta
+import numpy as np
+from storage import open_store
+
+DAY = 86400
+HOUR = 3600
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def local_offsets(starts):
+    """UTC offset in seconds of each epoch, looked up once per distinct hour"""
+    if not len(starts):
+        return np.zeros(0, dtype=np.int64)
+    hours, inverse = np.unique(starts // HOUR, return_inverse=True)
+    offsets = np.fromiter((time.localtime(int(hour) * HOUR).tm_gmtoff for hour in hours),
+                          dtype=np.int64, count=len(hours))
+    return offsets[inverse]
+
+
+def day_to_date(day):
+    return date(1970, 1, 1) + timedelta(days=int(day))
+
+
+class SessionArrays:
+    """Session history as column arrays: app id, start epoch, duration
+
+    The arrays share memory with the SessionTable they were built from.
+    The local-time column (and the local day numbers derived from it) is
+    computed on first use.
+    """
+
+    def __init__(self, apps, app_ids, starts, durations):
+        self.apps = list(apps)
+        self.app_ids = app_ids
+        self.starts = starts
+        self.durations = durations
+        self._local = None
+
+    @classmethod
+    def from_table(cls, table):
+        return cls(table.apps,
+                   np.frombuffer(table.app_column, dtype=np.uint32),
+                   np.frombuffer(table.starts, dtype=np.int64),
+                   np.frombuffer(table.durations, dtype=np.uint32))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def local(self):
+        """Local time of each start, as seconds since the local epoch"""
+        if self._local is None:
+            self._local = self.starts + local_offsets(self.starts)
+        return self._local
+
+    @property
+    def days(self):
+        """Local day number (days since 1970-01-01) of each start"""
+        return self.local // DAY
+
+    def select(self, mask):
+        subset = SessionArrays(self.apps, self.app_ids[mask], self.starts[mask], self.durations[mask])
+        if self._local is not None:
+            subset._local = self._local[mask]
+        return subset
+
+    def for_app(self, app_name):
+        if app_name not in self.apps:
+            return self.select(np.zeros(len(self), dtype=bool))
+        return self.select(self.app_ids == self.apps.index(app_name))
+
+    def between(self, start_date=None, end_date=None):
+        """Sessions starting between two local dates (inclusive)"""
+        days = self.days
+        mask = np.ones(len(self), dtype=bool)
+        if start_date is not None:
+            mask &= days >= (start_date - date(1970, 1, 1)).days
+        if end_date is not None:
+            mask &= days <= (end_date - date(1970, 1, 1)).days
+        return self.select(mask)
+
+
+def app_totals(sessions):
+    """{app: {"total_time", "session_count", "average"}} for apps with sessions"""
+    minlength = len(sessions.apps)
+    totals = np.bincount(sessions.app_ids, weights=sessions.durations, minlength=minlength)
+    counts = np.bincount(sessions.app_ids, minlength=minlength)
+    return {
+        sessions.apps[i]: {
+            "total_time": int(totals[i]),
+            "session_count": int(counts[i]),
+            "average": float(totals[i] / counts[i]),
+        }
+        for i in np.flatnonzero(counts)
+    }
+
+
+def daily_histogram(sessions):
+    """{"YYYY-MM-DD": seconds} for every day from the first to the last session"""
+    if not len(sessions):
+        return {}
+    days = sessions.days
+    first = int(days.min())
+    totals = np.bincount(days - first, weights=sessions.durations)
+    return {day_to_date(first + i).isoformat(): int(total) for i, total in enumerate(totals)}
+
+
+def weekly_histogram(sessions):
+    """{"YYYY-Www": seconds} per ISO week from the first to the last session"""
+    if not len(sessions):
+        return {}
+    # 1970-01-01 was a Thursday, so day + 3 counts from a Monday
+    weeks = (sessions.days + 3) // 7
+    first = int(weeks.min())
+    totals = np.bincount(weeks - first, weights=sessions.durations)
+    histogram = {}
+    for i, total in enumerate(totals):
+        year, week, _ = day_to_date((first + i) * 7 - 3).isocalendar()
+        histogram[f"{year}-W{week:02}"] = int(total)
+    return histogram
+
+
+def streaks(sessions, today=None):
+    """Longest and current run of consecutive days with at least one session"""
+    days = np.unique(sessions.days)
+    if not len(days):
+        return {"longest": 0, "longest_start": None, "current": 0}
+
+    # Runs of consecutive days are split wherever the gap is not one day
+    breaks = np.flatnonzero(np.diff(days) != 1) + 1
+    run_starts = np.concatenate(([0], breaks))
+    run_lengths = np.diff(np.concatenate((run_starts, [len(days)])))
+    longest = int(np.argmax(run_lengths))
+
+    # The current streak may end today or yesterday
+    today = (today or date.today()) - date(1970, 1, 1)
+    current = int(run_lengths[-1]) if today.days - int(days[-1]) <= 1 else 0
+    return {
+        "longest": int(run_lengths[longest]),
+        "longest_start": day_to_date(days[run_starts[longest]]).isoformat(),
+        "current": current,
+    }
+
+
+def longest_sessions(sessions):
+    """{app: {"duration", "start"}} of each app's longest session"""
+    if not len(sessions):
+        return {}
+    longest = np.zeros(len(sessions.apps), dtype=np.uint32)
+    np.maximum.at(longest, sessions.app_ids, sessions.durations)
+
+    # First row of each app that reaches its maximum
+    rows = np.flatnonzero(sessions.durations == longest[sessions.app_ids])
+    app_ids, first = np.unique(sessions.app_ids[rows], return_index=True)
+    return {
+        sessions.apps[app_id]: {
+            "duration": int(sessions.durations[row]),
+            "start": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(int(sessions.starts[row]))),
+        }
+        for app_id, row in zip(app_ids, rows[first])
+    }
+
+
+def week_slot(hours):
+    """Heatmap cell (weekday * 24 + hour, Monday first) of local hour numbers"""
+    return (hours // 24 + 3) % 7 * 24 + hours % 24
+
+
+def heatmap(sessions):
+    """7x24 array of tracked seconds per local weekday (Mon first) and hour
+
+    Sessions count towards every hour they cover, not just the one they
+    started in: the partial first and last hours are added directly, the
+    whole hours in between through a difference array over the hour axis.
+    """
+    active = sessions.durations > 0
+    if not active.any():
+        return np.zeros((7, 24))
+
+    starts = sessions.local[active]
+    ends = starts + sessions.durations[active].astype(np.int64)
+    first_hour = starts // HOUR
+    last_hour = (ends - 1) // HOUR
+    spans = last_hour > first_hour
+
+    cells = 7 * 24
+    grid = np.bincount(week_slot(first_hour),
+                       weights=np.where(spans, (first_hour + 1) * HOUR - starts, ends - starts),
+                       minlength=cells)
+    grid += np.bincount(week_slot(last_hour[spans]),
+                        weights=ends[spans] - last_hour[spans] * HOUR, minlength=cells)
+
+    # Number of sessions covering each whole hour strictly between first and last
+    base = int(first_hour.min())
+    length = int(last_hour.max()) - base + 1
+    covering = np.cumsum(np.bincount(first_hour[spans] + 1 - base, minlength=length + 1)
+                         - np.bincount(last_hour[spans] - base, minlength=length + 1))[:length]
+    grid += np.bincount(week_slot(np.arange(base, base + length)), weights=covering * HOUR, minlength=cells)
+    return grid.reshape(7, 24)
+
+
+def build_report(sessions, today=None):
+    """Every report for sessions, as plain JSON-serializable values"""
+    return {
+        "sessions": len(sessions),
+        "total_time": int(sessions.durations.sum(dtype=np.int64)),
+        "apps": app_totals(sessions),
+        "daily": daily_histogram(sessions),
+        "weekly": weekly_histogram(sessions),
+        "streaks": streaks(sessions, today),
+        "longest_sessions": longest_sessions(sessions),
+        "heatmap": heatmap(sessions).astype(int).tolist(),
+    }
+
+
+def format_duration(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def format_report(report):
+    """Plain text rendering of build_report()"""
+    lines = [f"{report['sessions']} sessions, {format_duration(report['total_time'])} tracked", ""]
+
+    lines.append("Per app:")
+    apps = sorted(report["apps"].items(), key=lambda item: item[1]["total_time"], reverse=True)
+    for app_name, totals in apps:
+        longest = report["longest_sessions"][app_name]
+        lines.append(f"  {app_name:<30} {format_duration(totals['total_time'])}  "
+                     f"{totals['session_count']:>6} sessions  longest {format_duration(longest['duration'])}")
+
+    streak = report["streaks"]
+    lines += ["", f"Streaks: current {streak['current']} days, "
+                  f"longest {streak['longest']} days (from {streak['longest_start']})"]
+
+    lines += ["", "Last 8 weeks:"]
+    for week, total in list(report["weekly"].items())[-8:]:
+        lines.append(f"  {week}  {format_duration(total)}")
+
+    lines += ["", "Time of day (hours tracked):", "       " + "".join(f"{h:>4}" for h in range(0, 24, 3))]
+    for weekday, row in zip(WEEKDAYS, report["heatmap"]):
+        lines.append(f"  {weekday}  " + "".join(f"{sum(row[h:h + 3]) / 3600:>4.0f}" for h in range(0, 24, 3)))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report on recorded productivity timer sessions")
+    parser.add_argument("--app", help="only sessions of this app")
+    parser.add_argument("--since", type=date.fromisoformat, help="first local date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="last local date (YYYY-MM-DD)")
+    parser.add_argument("--store", choices=("journal", "sqlite"), help="storage backend to read")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    load_start = time.perf_counter()
+    store = open_store(args.store)
+    store.load_read_only()
+    sessions = SessionArrays.from_table(store.load_sessions())
+    report_start = time.perf_counter()
+
+    if args.app:
+        sessions = sessions.for_app(args.app)
+    if args.since or args.until:
+        sessions = sessions.between(args.since, args.until)
+    report = build_report(sessions)
+    done = time.perf_counter()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    print(f"\nLoaded in {report_start - load_start:.3f}s, reported in {done - report_start:.3f}s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import time
+from array import array
+import psutil
+
+# Sampling period; 0 turns sampling off
+SAMPLE_INTERVAL_MS = int(os.environ.get("PRODUCTIVITY_TIMER_SAMPLE_MS", "5000") or 0)
+
+
+class SampleRing:
+    """Fixed-size ring of (cpu %, RSS bytes, thread count) samples
+
+    One preallocated array per field; adding a sample overwrites the
+    oldest once the ring is full. Min/avg/max are kept as running values so
+    they cover the whole session, p95 is taken over the samples still in
+    the ring (the last capacity samples).
+    """
+
+    FIELDS = ("cpu_percent", "rss", "threads")
+
+    def __init__(self, capacity=2048):
+        self.capacity = capacity
+        self.columns = {
+            "cpu_percent": array('d', bytes(8 * capacity)),
+            "rss": array('q', bytes(8 * capacity)),
+            "threads": array('I', bytes(4 * capacity)),
+        }
+        self.clear()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def clear(self):
+        self.count = 0
+        self.minimum = dict.fromkeys(self.FIELDS)
+        self.maximum = dict.fromkeys(self.FIELDS)
+        self.total = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, cpu_percent, rss, threads):
+        slot = self.count % self.capacity
+        self.count += 1
+        for field, value in zip(self.FIELDS, (cpu_percent, rss, threads)):
+            self.columns[field][slot] = value
+            self.total[field] += value
+            if self.minimum[field] is None or value < self.minimum[field]:
+                self.minimum[field] = value
+            if self.maximum[field] is None or value > self.maximum[field]:
+                self.maximum[field] = value
+
+    def percentile(self, field, fraction):
+        values = sorted(self.columns[field][:len(self)])
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def summary(self):
+        """{field: {"min", "avg", "max", "p95"}} plus the sample count, None if empty"""
+        if not self.count:
+            return None
+        summary = {"samples": self.count}
+        for field in self.FIELDS:
+            summary[field] = {
+                "min": self.minimum[field],
+                "avg": self.total[field] / self.count,
+                "max": self.maximum[field],
+                "p95": self.percentile(field, 0.95),
+            }
+        return summary
+
+
+class ResourceSampler:
+    """Samples CPU %, RSS and thread count of the process detection found
+
+    It is handed the (pid, create_time) the watcher already pinned and
+    never looks at the process table itself. The psutil.Process object is
+    kept between samples, so a sample is one oneshot() read of the
+    process's stat/status files. stats() reports the measured cost per
+    sample.
+    """
+
+    def __init__(self, capacity=2048):
+        self.ring = SampleRing(capacity)
+        self.process = None
+        self.identity = None
+
+        # Overhead accounting
+        self.calls = 0
+        self.samples = 0
+        self.failures = 0
+        self.sample_time = 0.0
+        self.sample_cpu_time = 0.0
+
+    def sample(self, pinned):
+        """Take one sample of the pinned (pid, create_time), if any"""
+        if pinned is None:
+            return False
+
+        self.calls += 1
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            if pinned != self.identity:
+                self.process = psutil.Process(pinned[0])
+                self.identity = pinned
+                # The first cpu_percent() call only sets the baseline
+                self.process.cpu_percent(None)
+                return False
+
+            with self.process.oneshot():
+                self.ring.add(self.process.cpu_percent(None),
+                              self.process.memory_info().rss,
+                              self.process.num_threads())
+            self.samples += 1
+            return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self.failures += 1
+            self.process = None
+            self.identity = None
+            return False
+        finally:
+            self.sample_time += time.perf_counter() - wall_start
+            self.sample_cpu_time += time.thread_time() - cpu_start
+
+    def finish_session(self):
+        """Summary of the samples since the last call, clearing the ring"""
+        summary = self.ring.summary()
+        self.ring.clear()
+        return summary
+
+    def stats(self):
+        calls = self.calls
+        return {
+            "samples": self.samples,
+            "failures": self.failures,
+            "sample_us_avg": 1e6 * self.sample_time / calls if calls else None,
+            "sample_cpu_us_avg": 1e6 * self.sample_cpu_time / calls if calls else None,
+        }
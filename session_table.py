@@ -0,0 +1,183 @@
+import sys
+import json
+import time
+import struct
+from array import array
+from datetime import datetime, timedelta
+
+# File layout: header, app names, then one column per field (little endian),
+# then a JSON metadata blob (per-app totals and rollups, per-session resource usage)
+MAGIC = b"PTSS"
+VERSION = 1
+HEADER = struct.Struct("<4sHQII")
+NAME_LENGTH = struct.Struct("<H")
+
+
+def legacy_session_start(session):
+    """Start epoch of a session stored as {"date", "start_time", "duration"}
+
+    The old format saved the date the session ended and the time of day it
+    started. If starting on that date would push the end onto the next day,
+    the session must have started the day before.
+    """
+    start = datetime.strptime(f"{session['date']} {session['start_time']}", "%Y-%m-%d %H:%M:%S")
+    if (start + timedelta(seconds=session["duration"])).date() != start.date():
+        start -= timedelta(days=1)
+    return int(time.mktime(start.timetuple()))
+
+
+def legacy_session_dict(start, duration):
+    """The old {"date", "start_time", "duration"} form of a session"""
+    return {
+        "date": datetime.fromtimestamp(start + duration).strftime("%Y-%m-%d"),
+        "duration": duration,
+        "start_time": datetime.fromtimestamp(start).strftime("%H:%M:%S"),
+    }
+
+
+class SessionTable:
+    """Array-backed session store
+
+    Each session is three fixed-width fields: start epoch (int64), duration
+    in seconds (uint32) and app id (uint32), kept in one array per field.
+    App names are stored once in the apps list. The few sessions that have
+    a resource usage summary keep it in the sparse resources dict, keyed by
+    row, which is saved in the metadata blob.
+    """
+
+    def __init__(self):
+        self.apps = []
+        self.app_ids = {}
+        self.starts = array('q')
+        self.durations = array('I')
+        self.app_column = array('I')
+        self.resources = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def app_id(self, app_name):
+        """Id for app_name, adding it if needed"""
+        app_id = self.app_ids.get(app_name)
+        if app_id is None:
+            app_id = len(self.apps)
+            self.apps.append(app_name)
+            self.app_ids[app_name] = app_id
+        return app_id
+
+    def append(self, app_name, start, duration, resources=None):
+        if resources:
+            self.resources[len(self.starts)] = resources
+        self.starts.append(int(start))
+        self.durations.append(int(duration))
+        self.app_column.append(self.app_id(app_name))
+
+    def rows(self, app_name=None):
+        """Yield (app_name, start, duration), optionally for one app only"""
+        wanted = None if app_name is None else self.app_ids.get(app_name, -1)
+        for start, duration, app_id in zip(self.starts, self.durations, self.app_column):
+            if wanted is None or app_id == wanted:
+                yield self.apps[app_id], start, duration
+
+    @classmethod
+    def from_statistics(cls, statistics):
+        """Convert {app: {"sessions": [old session dicts]}} losslessly"""
+        table = cls()
+        for app_name, stats in statistics.items():
+            for session in stats.get("sessions", []):
+                table.append(app_name, legacy_session_start(session), session["duration"])
+        return table
+
+    def to_statistics(self):
+        """Rebuild {app: {"total_time", "sessions": [old session dicts]}}"""
+        statistics = {}
+        for app_name, start, duration in self.rows():
+            stats = statistics.setdefault(app_name, {"total_time": 0, "sessions": []})
+            stats["sessions"].append(legacy_session_dict(start, duration))
+            stats["total_time"] += duration
+        return statistics
+
+    def write(self, f, seq=0, metadata=None):
+        """Write the table to a binary file object"""
+        f.write(HEADER.pack(MAGIC, VERSION, seq, len(self.apps), len(self)))
+        for app_name in self.apps:
+            encoded = app_name.encode("utf-8")
+            f.write(NAME_LENGTH.pack(len(encoded)))
+            f.write(encoded)
+
+        for column in (self.starts, self.durations, self.app_column):
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            column.tofile(f)
+
+        metadata = dict(metadata or {})
+        if self.resources:
+            metadata["resources"] = {str(row): summary for row, summary in self.resources.items()}
+        f.write(json.dumps(metadata).encode("utf-8"))
+
+    @classmethod
+    def read(cls, f):
+        """Read a table written by write(), returns (table, seq, metadata)"""
+        magic, version, seq, app_count, row_count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a session table file")
+
+        table = cls()
+        for _ in range(app_count):
+            (length,) = NAME_LENGTH.unpack(f.read(NAME_LENGTH.size))
+            table.app_id(f.read(length).decode("utf-8"))
+
+        for column in (table.starts, table.durations, table.app_column):
+            column.fromfile(f, row_count)
+            if sys.byteorder == "big":
+                column.byteswap()
+
+        metadata = f.read()
+        metadata = json.loads(metadata) if metadata else {}
+        table.resources = {int(row): summary for row, summary in metadata.pop("resources", {}).items()}
+        return table, seq, metadata
+
+
+def read_rows(f, first_row=0, chunk_rows=65536):
+    """Stream a table written by SessionTable.write(), returns (seq, row count, rows)
+
+    rows yields (app_name, start, duration, resources) from first_row on,
+    reading chunk_rows of each column at a time instead of the whole
+    table. f has to stay open until rows is used up.
+    """
+    magic, version, seq, app_count, row_count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a session table file")
+
+    apps = []
+    for _ in range(app_count):
+        (length,) = NAME_LENGTH.unpack(f.read(NAME_LENGTH.size))
+        apps.append(f.read(length).decode("utf-8"))
+
+    # Columns in file order with their offsets, the metadata blob after them
+    columns = []
+    offset = f.tell()
+    for typecode in ("q", "I", "I"):
+        columns.append((typecode, offset))
+        offset += array(typecode).itemsize * row_count
+    f.seek(offset)
+    metadata = f.read()
+    metadata = json.loads(metadata) if metadata else {}
+    resources = {int(row): summary for row, summary in metadata.get("resources", {}).items()}
+
+    def rows():
+        for first in range(first_row, row_count, chunk_rows):
+            count = min(chunk_rows, row_count - first)
+            chunk = []
+            for typecode, column_offset in columns:
+                column = array(typecode)
+                f.seek(column_offset + first * column.itemsize)
+                column.fromfile(f, count)
+                if sys.byteorder == "big":
+                    column.byteswap()
+                chunk.append(column)
+            for row, (start, duration, app_id) in enumerate(zip(*chunk), first):
+                yield apps[app_id], start, duration, resources.get(row)
+
+    return seq, row_count, rows()
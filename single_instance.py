@@ -0,0 +1,168 @@
+"""One GUI per user: later launches hand their request to the running one
+
+The first launch takes INSTANCE_LOCK, holds it for as long as it runs and
+listens for requests on INSTANCE_SOCKET (a loopback TCP port written to
+INSTANCE_PORT_PATH where Unix sockets are not available). A later launch
+finds the lock taken, sends its request as one JSON line, waits for the
+acknowledgement and exits. This runs before Qt is imported or the data
+file is read, so the second launch only costs a few milliseconds.
+"""
+import os
+import time
+import socket
+import argparse
+
+from file_lock import FileLock
+from ipc import encode, LineReader
+
+HOME = os.path.expanduser("~")
+INSTANCE_LOCK = os.path.join(HOME, ".productivity_timer_gui.lock")
+INSTANCE_SOCKET = os.path.join(HOME, ".productivity_timer_gui.sock")
+INSTANCE_PORT_PATH = os.path.join(HOME, ".productivity_timer_gui.port")
+
+
+def launch_request(argv):
+    """The request a launch with these arguments makes: track an app, or just show the window"""
+    parser = argparse.ArgumentParser(description="Productivity timer")
+    parser.add_argument("track", nargs="?", metavar="PATH", help="executable to select for tracking")
+    parser.add_argument("--track", dest="track_option", metavar="PATH",
+                        help="same as giving PATH on its own")
+    parser.add_argument("--name", help="display name of the app (defaults to the file name)")
+    # Anything else is left for QApplication (-style, -platform, ...)
+    args, _ = parser.parse_known_args(argv)
+
+    path = args.track_option or args.track
+    if not path:
+        return {"cmd": "activate"}
+    path = os.path.abspath(path)
+    return {"cmd": "track", "path": path, "name": args.name or os.path.basename(path)}
+
+
+class InstanceServer:
+    """Listening side, owned by the running instance
+
+    fileno() becomes readable when a later launch connects; accept() then
+    reads its request. The instance lock is held until close().
+    """
+
+    def __init__(self, lock, socket_path=INSTANCE_SOCKET, port_path=INSTANCE_PORT_PATH):
+        self.lock = lock
+        self.socket_path = socket_path
+        self.port_path = port_path
+        if hasattr(socket, "AF_UNIX"):
+            # We hold the lock, so a socket file left behind is stale
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(socket_path)
+            os.chmod(socket_path, 0o600)
+        else:
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(("127.0.0.1", 0))
+            with open(port_path, 'w') as f:
+                f.write(str(self.server.getsockname()[1]))
+        self.server.listen(8)
+        self.server.setblocking(False)
+
+    def fileno(self):
+        return self.server.fileno()
+
+    def accept(self, timeout=0.5):
+        """Requests of the launch that connected, acknowledged; [] if there was none"""
+        try:
+            conn, _ = self.server.accept()
+        except OSError:
+            return []
+
+        reader = LineReader()
+        messages = []
+        try:
+            conn.settimeout(timeout)
+            while not messages:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                messages = reader.feed(data)
+            for _ in messages:
+                conn.sendall(encode({"ok": True}))
+        except OSError as e:
+            print(f"Error reading launch request: {e}")
+        finally:
+            conn.close()
+        return messages
+
+    def close(self):
+        self.server.close()
+        try:
+            os.unlink(self.socket_path if hasattr(socket, "AF_UNIX") else self.port_path)
+        except OSError:
+            pass
+        self.lock.release()
+
+
+def connect(socket_path=INSTANCE_SOCKET, port_path=INSTANCE_PORT_PATH, timeout=0.5):
+    """Connect to the running instance, returns None if it is not listening"""
+    try:
+        if hasattr(socket, "AF_UNIX"):
+            address = socket_path
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            with open(port_path, 'r') as f:
+                address = ("127.0.0.1", int(f.read()))
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    except (OSError, ValueError):
+        return None
+
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def forward(message, timeout=0.5):
+    """Hand message to the running instance, returns whether it acknowledged it"""
+    sock = connect(timeout=timeout)
+    if sock is None:
+        return False
+
+    reader = LineReader()
+    try:
+        sock.sendall(encode(message))
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                return False
+            for reply in reader.feed(data):
+                return bool(reply.get("ok"))
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def claim(message, timeout=2.0):
+    """Become the running instance or hand message over to it
+
+    Returns an InstanceServer when this process is the first, None when
+    the running instance took the request and this one should exit. A
+    running instance that does not answer within timeout raises
+    RuntimeError rather than starting a second one next to it.
+    """
+    lock = FileLock(INSTANCE_LOCK)
+    deadline = time.monotonic() + timeout
+    while True:
+        if lock.acquire(blocking=False):
+            try:
+                return InstanceServer(lock)
+            except OSError:
+                lock.release()
+                raise
+        # The holder may still be starting up, or just exiting
+        if forward(message):
+            return None
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"another instance holds {INSTANCE_LOCK} but does not answer")
+        time.sleep(0.02)
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import time
+
+# "1" prints the report to stderr, anything else is a file to append it to as a JSON line
+TIMING_ENV = "PRODUCTIVITY_TIMER_STARTUP_TIMING"
+
+
+class StartupTimer:
+    """Time spent in each startup phase, from the first import to first paint
+
+    mark() closes the current phase. Work deferred until after the first
+    paint (such as building the timer page on first use) is timed on its
+    own and added with add(), outside the startup total.
+    """
+
+    def __init__(self, started=None, target=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []
+        self.target = target if target is not None else os.environ.get(TIMING_ENV, "")
+
+    @property
+    def enabled(self):
+        return bool(self.target)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def add(self, phase, seconds):
+        self.phases.append((phase, seconds))
+
+    def as_dict(self):
+        return {
+            "phases": {phase: round(seconds * 1000, 2) for phase, seconds in self.phases},
+            "total_ms": round((self.last - self.started) * 1000, 2),
+        }
+
+    def report(self):
+        """Print or append the phases recorded so far"""
+        if not self.enabled:
+            return
+        if self.target == "1":
+            lines = [f"  {phase:<24} {seconds * 1000:8.1f} ms" for phase, seconds in self.phases]
+            lines.append(f"  {'total':<24} {(self.last - self.started) * 1000:8.1f} ms")
+            print("Startup timing:\n" + "\n".join(lines), file=sys.stderr)
+            return
+        try:
+            with open(self.target, 'a') as f:
+                f.write(json.dumps(dict(self.as_dict(), time=int(time.time()))) + "\n")
+        except OSError as e:
+            print(f"Error writing startup timing: {e}")
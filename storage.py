@@ -0,0 +1,935 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+from datetime import date
+from session_table import SessionTable, legacy_session_start, read_rows
+from file_lock import FileLock
+
+
+DATA_PATH = os.path.join(os.path.expanduser("~"), ".productivity_timer_data.json")
+SQLITE_PATH = os.path.join(os.path.expanduser("~"), ".productivity_timer_data.sqlite3")
+
+
+RECENT_APPS_LIMIT = 5
+
+
+def empty_app_data():
+    return {"recent_apps": [], "summary": {}}
+
+
+def session_fields(record):
+    """(start epoch, duration) of a session record in either journal format"""
+    if "start" in record:
+        return record["start"], record["duration"]
+    # Journals written before sessions were stored as epochs
+    session = record["session"]
+    return legacy_session_start(session), session["duration"]
+
+
+def add_recent_app(recent_apps, name, path):
+    """recent_apps with the app moved (or added) to the front, at most RECENT_APPS_LIMIT long"""
+    others = [app for app in recent_apps if app["path"] != path]
+    return ([{"name": name, "path": path}] + others)[:RECENT_APPS_LIMIT]
+
+
+def apply_record(app_data, record):
+    """Apply one journal record to whichever sections app_data holds"""
+    op = record.get("op")
+    if op == "recent_app":
+        # Incremental, so records from several trackers merge on replay
+        if "recent_apps" in app_data:
+            app_data["recent_apps"] = add_recent_app(app_data["recent_apps"], record["name"], record["path"])
+    elif op == "recent_apps":
+        # Whole lists, written before the incremental records
+        if "recent_apps" in app_data:
+            app_data["recent_apps"] = record["recent_apps"]
+    elif op == "session":
+        app_name = record["app"]
+        start, duration = session_fields(record)
+        if "summary" in app_data:
+            summary = app_data["summary"].setdefault(app_name, {"total_time": 0, "session_count": 0})
+            summary["total_time"] += duration
+            summary["session_count"] += 1
+        if "statistics" in app_data:
+            add_to_statistics(app_data["statistics"], app_name, start, duration)
+        if "sessions" in app_data:
+            app_data["sessions"].append(app_name, start, duration, record.get("resources"))
+
+
+ROLLUP_PERIODS = ("daily", "weekly", "monthly")
+
+
+def empty_rollups():
+    return {period: {} for period in ROLLUP_PERIODS}
+
+
+def local_date(start):
+    """Local "YYYY-MM-DD" date of an epoch timestamp"""
+    return time.strftime("%Y-%m-%d", time.localtime(start))
+
+
+def local_start(day, start_time):
+    """Epoch of a local "YYYY-MM-DD" date and "HH:MM:SS" time, as read in the current time zone"""
+    return int(time.mktime(time.strptime(f"{day} {start_time}", "%Y-%m-%d %H:%M:%S")))
+
+
+def rollup_buckets(date_str):
+    """Daily, ISO week and month bucket keys for a "YYYY-MM-DD" date"""
+    year, week, _ = date.fromisoformat(date_str).isocalendar()
+    return {"daily": date_str, "weekly": f"{year}-W{week:02}", "monthly": date_str[:7]}
+
+
+def add_to_rollups(rollups, date_str, duration):
+    for period, bucket in rollup_buckets(date_str).items():
+        totals = rollups.setdefault(period, {})
+        totals[bucket] = totals.get(bucket, 0) + duration
+
+
+def add_to_statistics(statistics, app_name, start, duration):
+    stats = statistics.setdefault(app_name, {"total_time": 0, "rollups": empty_rollups()})
+    stats["total_time"] += duration
+    add_to_rollups(stats["rollups"], local_date(start), duration)
+
+
+def build_statistics(table):
+    """Rebuild per-app totals and rollups from the raw sessions"""
+    statistics = {}
+    for app_name, start, duration in table.rows():
+        add_to_statistics(statistics, app_name, start, duration)
+    return statistics
+
+
+def summarize(table):
+    """Per-app totals for the summary section"""
+    summary = {}
+    for app_name, _, duration in table.rows():
+        entry = summary.setdefault(app_name, {"total_time": 0, "session_count": 0})
+        entry["total_time"] += duration
+        entry["session_count"] += 1
+    return summary
+
+
+def date_key(value):
+    """Normalize a date or "YYYY-MM-DD" string for comparisons"""
+    return value if value is None or isinstance(value, str) else value.strftime("%Y-%m-%d")
+
+
+def file_id(path):
+    """(device, inode) identifying the file at path, None if there is none"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def write_temp(path, mode, write):
+    """Write path + ".tmp" with write(f) and fsync it, returns the temp path or None"""
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+    except Exception as e:
+        print(f"Error saving app data: {e}")
+        return None
+
+
+def keep_damaged_copy(path):
+    """Copy a snapshot that failed to parse to path + ".damaged" (once), for recovery"""
+    copy_path = path + ".damaged"
+    if os.path.exists(copy_path):
+        return
+    try:
+        shutil.copy2(path, copy_path)
+        print(f"Kept a copy of the damaged {path} as {copy_path}")
+    except OSError as e:
+        print(f"Error copying damaged {path}: {e}")
+
+
+class JournalStore:
+    """Snapshot files plus an append-only journal of changes
+
+    The snapshot is split in two: the data file only holds the recent apps
+    and a per-app summary, so startup stays cheap however long the history
+    grows, while the session history lives in a binary history file (see
+    session_table) that is read the first time something asks for
+    statistics. In memory the history is a SessionTable plus per-app totals
+    and rollups.
+
+    Every change is appended to the journal as one fsync'd JSON line with a
+    sequence number. Once enough records have built up the journal is rotated
+    and a background thread folds the rotated part into new snapshots. Each
+    snapshot remembers the last sequence number it contains, so loading reads
+    a snapshot and replays only newer journal records. Older layouts (a
+    single JSON data file, or a JSON history file) are converted on first run.
+
+    Several processes can share one store. Appending, rotating the journal
+    and publishing new snapshots all happen under an advisory lock on a
+    lock file next to the data file. Before appending, a process first
+    applies whatever the others appended since it last looked (see
+    sync_journal), so sequence numbers stay contiguous and nobody's update
+    is lost. Snapshots are written to a temporary file and renamed into
+    place, and only one process at a time folds the journal.
+    """
+
+    def __init__(self, data_path=DATA_PATH, compact_every=500):
+        self.data_path = data_path
+        base_path = os.path.splitext(data_path)[0]
+        self.history_path = base_path + ".sessions"
+        self.json_history_path = base_path + ".history.json"
+        self.journal_path = base_path + ".journal"
+        self.rotated_path = self.journal_path + ".old"
+        self.compact_every = compact_every
+
+        self.app_data = None
+        self.seq = 0
+        self.pending_records = 0
+        self.needs_migration = False
+        # Identity (device, inode) of the live journal and how far it has been applied
+        self.journal_id = None
+        self.journal_offset = 0
+        # Held by every process (and thread) that writes or publishes store files
+        self.lock = FileLock(base_path + ".lock")
+        self.fold_lock = FileLock(base_path + ".fold.lock")
+        self.compaction_thread = None
+        self.read_only = False
+
+    def load(self):
+        """Load the recent apps and summary, replaying the journal"""
+        with self.lock:
+            index_seq, table = self.reload()
+            if table is not None:
+                # Old single-file layout: history is already in memory
+                history = {"statistics": build_statistics(table), "sessions": table}
+                self.replay_history(history, index_seq)
+                self.app_data.update(history)
+                self.needs_migration = True
+            elif os.path.exists(self.json_history_path):
+                self.needs_migration = True
+
+        if self.needs_migration or self.pending_records >= self.compact_every or os.path.exists(self.rotated_path):
+            self.compact()
+
+        return self.app_data
+
+    def load_read_only(self):
+        """Load the recent apps and every session, for tools that only read
+
+        Unlike load() nothing is migrated, compacted or written, so a
+        report or export never rewrites a store the tracker is using.
+        Only load_sessions() and iter_sessions() are meant to follow; the
+        sessions are left on disk until one of them asks.
+        """
+        app_data, index_seq, _ = self.read_index()
+        recent = {"recent_apps": app_data["recent_apps"]}
+        for record in self.read_journals():
+            if record["seq"] > index_seq:
+                apply_record(recent, record)
+        self.app_data = recent
+        self.read_only = True
+        return self.app_data
+
+    def load_statistics(self):
+        """Return per-app totals and rollups, reading the history on first use"""
+        self.load_history()
+        return self.app_data["statistics"]
+
+    def load_sessions(self):
+        """Return the SessionTable of every recorded session"""
+        self.load_history()
+        return self.app_data["sessions"]
+
+    def load_history(self):
+        if "sessions" in self.app_data:
+            return
+        if self.read_only:
+            self.app_data["sessions"] = self.read_snapshot()[1]
+            return
+
+        # Under the lock no fold can publish or remove a journal between
+        # reading the history and replaying, and the journals on disk hold
+        # exactly the records applied in memory
+        with self.lock:
+            self.sync_journal()
+            history, seq = self.read_history()
+            self.replay_history(history, seq)
+            self.app_data.update(history)
+
+    def read_snapshot(self):
+        """(recent apps, SessionTable) of everything on disk, without migrating or compacting"""
+        app_data, index_seq, table = self.read_index()
+        seq = index_seq
+        if table is None:
+            history, seq = self.read_history()
+            table = history["sessions"]
+        recent = {"recent_apps": app_data["recent_apps"]}
+        sessions = {"sessions": table}
+        for record in self.read_journals():
+            if record["seq"] > seq:
+                apply_record(sessions, record)
+            if record["seq"] > index_seq:
+                apply_record(recent, record)
+        return recent["recent_apps"], table
+
+    def replay_history(self, history, seq):
+        for record in self.read_journals():
+            if record["seq"] > seq:
+                apply_record(history, record)
+
+    def reload(self):
+        """Re-read the index and both journals into app_data, with the lock held
+
+        Returns (index seq, SessionTable from an old single-file layout).
+        app_data is updated in place, without the history, which is read
+        again when next asked for.
+        """
+        app_data, index_seq, table = self.read_index()
+        if self.app_data is None:
+            self.app_data = app_data
+        else:
+            self.app_data.clear()
+            self.app_data.update(app_data)
+
+        self.seq = index_seq
+        self.pending_records = 0
+        self.apply_journal(self.rotated_path, 0, strict=False)
+        self.journal_id = file_id(self.journal_path)
+        self.journal_offset = self.apply_journal(self.journal_path, 0, strict=False)
+        return index_seq, table
+
+    def sync_journal(self):
+        """Apply the records other processes appended since we last read the journal
+
+        Called with the lock held. If the journal we were following has been
+        rotated, the rest of it is read from the rotated file; if that has
+        already been folded away too, everything is re-read.
+        """
+        current_id = file_id(self.journal_path)
+        if self.journal_id is not None and current_id != self.journal_id:
+            offset = None
+            if file_id(self.rotated_path) == self.journal_id:
+                offset = self.apply_journal(self.rotated_path, self.journal_offset)
+            if offset is None:
+                self.reload()
+                return
+            self.journal_offset = 0
+
+        self.journal_id = current_id
+        if current_id is not None:
+            offset = self.apply_journal(self.journal_path, self.journal_offset)
+            if offset is None:
+                self.reload()
+                return
+            self.journal_offset = offset
+
+    def apply_journal(self, path, offset, strict=True):
+        """Apply the complete records of a journal from offset on, returns the new offset
+
+        With strict, returns None instead when a record is missing before
+        the first new one: the records in between were folded by another
+        process and only a reload can pick them up.
+        """
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return offset
+        except OSError as e:
+            print(f"Error reading journal: {e}")
+            return offset
+
+        # A line without its newline is still being written, or was torn by a crash
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record["seq"] > self.seq:
+                if strict and record["seq"] != self.seq + 1:
+                    return None
+                apply_record(self.app_data, record)
+                self.seq = record["seq"]
+                self.pending_records += 1
+        return offset + end
+
+    def read_index(self, strict=False):
+        """Return (index data, seq, SessionTable from an old single-file layout)
+
+        An index file that exists but cannot be read reads as empty, unless
+        strict: then a copy of it is kept and the error is raised.
+        """
+        if os.path.exists(self.data_path):
+            try:
+                with open(self.data_path, 'r') as f:
+                    data = json.load(f)
+                seq = data.pop("journal_seq", 0)
+                table = None
+                if "statistics" in data:
+                    table = SessionTable.from_statistics(data.pop("statistics"))
+                if "summary" not in data:
+                    data["summary"] = summarize(table or SessionTable())
+                data.setdefault("recent_apps", [])
+                return data, seq, table
+            except Exception as e:
+                print(f"Error loading app data: {e}")
+                if strict:
+                    keep_damaged_copy(self.data_path)
+                    raise
+
+        return empty_app_data(), 0, None
+
+    def read_history(self, strict=False):
+        """Return ({"statistics", "sessions"}, seq) from the history file
+
+        Like read_index, a history that cannot be read reads as empty
+        unless strict.
+        """
+        if os.path.exists(self.history_path):
+            try:
+                with open(self.history_path, 'rb') as f:
+                    table, seq, metadata = SessionTable.read(f)
+                statistics = metadata.get("statistics")
+                if statistics is None:
+                    statistics = build_statistics(table)
+                return {"statistics": statistics, "sessions": table}, seq
+            except Exception as e:
+                print(f"Error loading app data: {e}")
+                if strict:
+                    keep_damaged_copy(self.history_path)
+                    raise
+
+        # JSON history, or everything in the data file, from older layouts
+        for path in (self.json_history_path, self.data_path):
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if "statistics" in data:
+                    table = SessionTable.from_statistics(data["statistics"])
+                    return {"statistics": build_statistics(table), "sessions": table}, data.get("journal_seq", 0)
+            except Exception as e:
+                print(f"Error loading app data: {e}")
+                if strict:
+                    keep_damaged_copy(path)
+                    raise
+
+        return {"statistics": {}, "sessions": SessionTable()}, 0
+
+    def read_journals(self):
+        for path in (self.rotated_path, self.journal_path):
+            yield from self.read_journal(path)
+
+    def read_journal(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Torn write, later writers start on a new line
+                        continue
+        except OSError as e:
+            print(f"Error reading journal: {e}")
+
+    def append(self, record):
+        """Apply one record and durably append it to the journal"""
+        with self.lock:
+            # Other processes' records first, so ours gets the next sequence number
+            self.sync_journal()
+            apply_record(self.app_data, record)
+            self.seq += 1
+            line = (json.dumps(dict(record, seq=self.seq)) + "\n").encode("utf-8")
+            try:
+                with open(self.journal_path, 'ab') as f:
+                    if f.tell() > self.journal_offset:
+                        # A writer crashed mid-record, end its torn line first
+                        line = b"\n" + line
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    self.journal_offset = f.tell()
+                    stat = os.fstat(f.fileno())
+                    self.journal_id = (stat.st_dev, stat.st_ino)
+            except OSError as e:
+                print(f"Error saving app data: {e}")
+            self.pending_records += 1
+
+        if self.pending_records >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into the snapshots on a background thread"""
+        with self.lock:
+            if self.compaction_thread is not None and self.compaction_thread.is_alive():
+                return
+
+            # A rotated journal left over from an interrupted compaction is
+            # folded first; new records keep going to the live journal
+            if not os.path.exists(self.rotated_path):
+                if os.path.exists(self.journal_path):
+                    # Everything in the journal is in memory before it moves
+                    self.sync_journal()
+                    os.replace(self.journal_path, self.rotated_path)
+                    self.journal_id, self.journal_offset = None, 0
+                elif not self.needs_migration:
+                    return
+            migrate = self.needs_migration
+            self.pending_records = 0
+            self.needs_migration = False
+
+            self.compaction_thread = threading.Thread(target=self.fold_rotated_journal, args=(migrate,),
+                                                      daemon=True)
+            self.compaction_thread.start()
+
+    def fold_rotated_journal(self, migrate=False):
+        # One process folds at a time; the snapshots are only written by
+        # the holder of the fold lock, so they can be read without the main
+        # lock while the slow part runs
+        with self.fold_lock:
+            if not migrate and not os.path.exists(self.rotated_path):
+                # Another process folded it while we waited
+                return
+            # A snapshot that exists but cannot be read must not be replaced
+            # by what could be read, that would drop everything it held. The
+            # rotated journal stays put and new records keep going to the
+            # journal until the file is repaired
+            try:
+                index, index_seq, _ = self.read_index(strict=True)
+                history, history_seq = self.read_history(strict=True)
+            except Exception:
+                print("Not folding the journal into damaged app data")
+                return
+
+            seq = max(index_seq, history_seq)
+            for record in self.read_journal(self.rotated_path):
+                if record["seq"] > index_seq:
+                    apply_record(index, record)
+                if record["seq"] > history_seq:
+                    apply_record(history, record)
+                seq = max(seq, record["seq"])
+
+            history_tmp = self.write_history_temp(history, seq)
+            index_tmp = self.write_snapshot_temp(self.data_path, index, seq)
+            if history_tmp is None or index_tmp is None:
+                return
+
+            # Published together under the lock, so a reader never sees the
+            # rotated journal gone before both snapshots hold its records.
+            # History first, so the index never claims records the history lacks
+            with self.lock:
+                try:
+                    os.replace(history_tmp, self.history_path)
+                    os.replace(index_tmp, self.data_path)
+                    for path in (self.rotated_path, self.json_history_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                except OSError as e:
+                    print(f"Error saving app data: {e}")
+
+    def write_history(self, history, seq):
+        """Atomically replace the binary history file"""
+        return self.publish(self.write_history_temp(history, seq), self.history_path)
+
+    def write_snapshot(self, path, data, seq):
+        """Atomically replace a JSON snapshot file"""
+        return self.publish(self.write_snapshot_temp(path, data, seq), path)
+
+    def write_history_temp(self, history, seq):
+        def write(f):
+            history["sessions"].write(f, seq, {"statistics": history["statistics"]})
+        return write_temp(self.history_path, 'wb', write)
+
+    def write_snapshot_temp(self, path, data, seq):
+        return write_temp(path, 'w', lambda f: json.dump(dict(data, journal_seq=seq), f))
+
+    def publish(self, tmp_path, path):
+        if tmp_path is None:
+            return False
+        try:
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Error saving app data: {e}")
+            return False
+
+    def wait(self):
+        """Wait for a running compaction to finish"""
+        thread = self.compaction_thread
+        if thread is not None:
+            thread.join()
+
+    def iter_sessions(self, app_name=None, after=0):
+        """Yield (row, app, start, duration, resources) in recording order
+
+        Rows count from 1 in the order sessions were recorded, so a caller
+        can resume after the last row it has seen. Unless the history is
+        already in memory it is streamed: the history file a chunk of rows
+        at a time, then the sessions still in the journals.
+        """
+        if "sessions" not in self.app_data and os.path.exists(self.history_path):
+            # Under the lock no fold can publish a new history or remove a
+            # journal between opening the one and reading the other
+            with self.lock:
+                f = open(self.history_path, 'rb')
+                try:
+                    seq, row_count, rows = read_rows(f, after)
+                except Exception as e:
+                    print(f"Error loading app data: {e}")
+                    f.close()
+                    f = None
+                else:
+                    tail = [record for record in self.read_journals()
+                            if record["seq"] > seq and record.get("op") == "session"]
+            if f is not None:
+                with f:
+                    for row, (app, start, duration, resources) in enumerate(rows, after + 1):
+                        if app_name is None or app == app_name:
+                            yield row, app, start, duration, resources
+                for row, record in enumerate(tail, row_count + 1):
+                    if row > after and (app_name is None or record["app"] == app_name):
+                        yield (row, record["app"], *session_fields(record), record.get("resources"))
+                return
+
+        table = self.load_sessions()
+        wanted = None if app_name is None else table.app_ids.get(app_name, -1)
+        for index in range(after, len(table)):
+            app_id = table.app_column[index]
+            if wanted is None or app_id == wanted:
+                yield (index + 1, table.apps[app_id], table.starts[index], table.durations[index],
+                       table.resources.get(index))
+
+    def refresh(self):
+        """Apply the records other processes appended since we last looked"""
+        with self.lock:
+            self.sync_journal()
+
+    def total_time(self, app_name, start_date=None, end_date=None):
+        """Total tracked seconds for app_name, optionally within a date range (inclusive)"""
+        if start_date is None and end_date is None:
+            self.refresh()
+            return self.app_data["summary"].get(app_name, {}).get("total_time", 0)
+
+        start_date, end_date = date_key(start_date), date_key(end_date)
+        return sum(total for day, total in self.rollups(app_name, "daily").items()
+                   if (start_date is None or day >= start_date)
+                   and (end_date is None or day <= end_date))
+
+    def rollups(self, app_name, period="daily"):
+        """Per-bucket totals for app_name ("daily", "weekly" or "monthly")"""
+        self.refresh()
+        stats = self.load_statistics().get(app_name)
+        if stats is None:
+            return {}
+        return dict(stats["rollups"][period])
+
+
+class SqliteStore:
+    """SQLite storage for app data
+
+    Sessions live in a table indexed by (app, date). Each keeps its start as
+    an epoch, so it reads back the same whatever the time zone; the local
+    start date (and time of day) next to it serves the date range queries.
+    The recent apps and a per-app summary have small
+    tables of their own, so startup only reads those. Daily, ISO week and
+    monthly rollups are kept in a rollups table updated with every insert.
+    The database runs in WAL mode so recording a session is a couple of
+    cheap writes. On first use any existing JSON data (and its journal) is
+    imported.
+
+    SQLite does the locking between processes sharing the database. When
+    another process has committed since we last looked (PRAGMA data_version
+    changed), the in-memory summary and recent apps are read again before
+    they are used.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            app TEXT NOT NULL,
+            date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            resources TEXT,
+            start INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS sessions_app_date ON sessions (app, date);
+        CREATE TABLE IF NOT EXISTS rollups (
+            app TEXT NOT NULL,
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            total_time INTEGER NOT NULL,
+            PRIMARY KEY (app, period, bucket)
+        );
+        CREATE TABLE IF NOT EXISTS summary (
+            app TEXT PRIMARY KEY,
+            total_time INTEGER NOT NULL,
+            session_count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS recent_apps (
+            position INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            path TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path=SQLITE_PATH, legacy_path=DATA_PATH):
+        self.db_path = db_path
+        self.legacy_path = legacy_path
+        self.app_data = None
+        self.db = None
+        self.data_version = None
+
+    def connect(self):
+        is_new = not os.path.exists(self.db_path)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+        # Databases from before sessions had resource usage summaries
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}
+        if "resources" not in columns:
+            try:
+                with self.db:
+                    self.db.execute("ALTER TABLE sessions ADD COLUMN resources TEXT")
+            except sqlite3.OperationalError:
+                # Another process upgraded the database first
+                pass
+        if "start" not in columns:
+            self.add_start_column()
+
+        # Databases from before the summary table existed
+        if self.db.execute("SELECT COUNT(*) FROM summary").fetchone()[0] == 0:
+            with self.db:
+                self.db.execute(
+                    "INSERT OR IGNORE INTO summary (app, total_time, session_count) "
+                    "SELECT app, SUM(duration), COUNT(*) FROM sessions GROUP BY app")
+
+        if self.db.execute("SELECT COUNT(*) FROM rollups").fetchone()[0] == 0:
+            self.rebuild_rollups()
+
+        if is_new and self.legacy_path and os.path.exists(self.legacy_path):
+            # Read only: loading could start a migration of the legacy files
+            # in the background that nothing waits for
+            recent_apps, table = JournalStore(self.legacy_path).read_snapshot()
+            self.import_sessions(recent_apps, table)
+
+    def add_start_column(self):
+        """Give databases from before the start column one, filled from the local date and time"""
+        try:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                columns = {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}
+                if "start" in columns:
+                    # Another process upgraded the database first
+                    return
+                self.db.execute("ALTER TABLE sessions ADD COLUMN start INTEGER")
+                rows = self.db.execute("SELECT id, date, start_time FROM sessions").fetchall()
+                self.db.executemany(
+                    "UPDATE sessions SET start = ? WHERE id = ?",
+                    ((local_start(day, start_time), row) for row, day, start_time in rows))
+        except sqlite3.Error as e:
+            print(f"Error upgrading app data: {e}")
+
+    def import_sessions(self, recent_apps, table):
+        """Copy recent apps and a SessionTable into the database"""
+        with self.db:
+            self.write_recent_apps(recent_apps)
+            for row, (app_name, start, duration) in enumerate(table.rows()):
+                self.insert_session(app_name, start, duration, table.resources.get(row))
+
+    def load_read_only(self):
+        """Like load(), on a read-only connection: no schema upgrade, legacy import or write"""
+        if os.path.exists(self.db_path):
+            self.db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        else:
+            # Nothing recorded yet, read from an empty schema
+            self.db = sqlite3.connect(":memory:")
+            self.db.executescript(self.SCHEMA)
+        return self.load()
+
+    def load(self):
+        """Load the recent apps and summary"""
+        try:
+            if self.db is None:
+                self.connect()
+
+            self.data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+            app_data = empty_app_data()
+            app_data["recent_apps"] = [
+                {"name": name, "path": path}
+                for name, path in self.db.execute("SELECT name, path FROM recent_apps ORDER BY position")]
+            app_data["summary"] = {
+                app_name: {"total_time": total_time, "session_count": session_count}
+                for app_name, total_time, session_count in self.db.execute(
+                    "SELECT app, total_time, session_count FROM summary")}
+        except sqlite3.Error as e:
+            print(f"Error loading app data: {e}")
+            app_data = empty_app_data()
+
+        if self.app_data is None:
+            self.app_data = app_data
+        else:
+            # Reloading after another process wrote: callers hold on to app_data
+            self.app_data.clear()
+            self.app_data.update(app_data)
+        return self.app_data
+
+    def refresh(self):
+        """Reload the summary and recent apps if another process committed since"""
+        try:
+            changed = self.db.execute("PRAGMA data_version").fetchone()[0] != self.data_version
+        except sqlite3.Error as e:
+            print(f"Error loading app data: {e}")
+            return
+        if changed:
+            self.load()
+
+    def load_statistics(self):
+        """Return per-app totals and rollups, reading the sessions on first use"""
+        self.load_history()
+        return self.app_data["statistics"]
+
+    def load_sessions(self):
+        """Return the SessionTable of every recorded session"""
+        self.load_history()
+        return self.app_data["sessions"]
+
+    def load_history(self):
+        self.refresh()
+        if "sessions" in self.app_data:
+            return
+
+        table = SessionTable()
+        for _, app_name, start, duration, resources in self.iter_sessions():
+            table.append(app_name, start, duration, resources)
+        self.app_data["statistics"] = build_statistics(table)
+        self.app_data["sessions"] = table
+
+    def append(self, record):
+        """Apply one record and write it to the database"""
+        self.refresh()
+        apply_record(self.app_data, record)
+        try:
+            with self.db:
+                if record.get("op") == "recent_app":
+                    # Read and rewrite the list in one write transaction, so a
+                    # change another tracker committed meanwhile is kept
+                    self.db.execute("BEGIN IMMEDIATE")
+                    recent_apps = [{"name": name, "path": path} for name, path in self.db.execute(
+                        "SELECT name, path FROM recent_apps ORDER BY position")]
+                    self.write_recent_apps(add_recent_app(recent_apps, record["name"], record["path"]))
+                elif record.get("op") == "recent_apps":
+                    self.write_recent_apps(record["recent_apps"])
+                elif record.get("op") == "session":
+                    self.insert_session(record["app"], *session_fields(record), record.get("resources"))
+        except sqlite3.Error as e:
+            print(f"Error saving app data: {e}")
+
+    def insert_session(self, app_name, start, duration, resources=None):
+        start_date = local_date(start)
+        self.db.execute(
+            "INSERT INTO sessions (app, date, start_time, duration, resources, start) VALUES (?, ?, ?, ?, ?, ?)",
+            (app_name, start_date, time.strftime("%H:%M:%S", time.localtime(start)), duration,
+             json.dumps(resources) if resources else None, int(start)))
+        self.db.execute(
+            "INSERT INTO summary (app, total_time, session_count) VALUES (?, ?, 1) "
+            "ON CONFLICT (app) DO UPDATE SET total_time = total_time + excluded.total_time, "
+            "session_count = session_count + 1",
+            (app_name, duration))
+        self.add_to_rollups(app_name, start_date, duration)
+
+    def add_to_rollups(self, app_name, date_str, duration):
+        self.db.executemany(
+            "INSERT INTO rollups (app, period, bucket, total_time) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (app, period, bucket) DO UPDATE SET total_time = total_time + excluded.total_time",
+            ((app_name, period, bucket, duration) for period, bucket in rollup_buckets(date_str).items()))
+
+    def rebuild_rollups(self):
+        """Recompute the rollups table from the raw sessions"""
+        with self.db:
+            self.db.execute("DELETE FROM rollups")
+            daily = self.db.execute(
+                "SELECT app, date, SUM(duration) FROM sessions GROUP BY app, date").fetchall()
+            for app_name, day, total in daily:
+                self.add_to_rollups(app_name, day, total)
+
+    def rollups(self, app_name, period="daily"):
+        """Per-bucket totals for app_name ("daily", "weekly" or "monthly")"""
+        return dict(self.db.execute(
+            "SELECT bucket, total_time FROM rollups WHERE app = ? AND period = ?", (app_name, period)))
+
+    def write_recent_apps(self, recent_apps):
+        self.db.execute("DELETE FROM recent_apps")
+        self.db.executemany(
+            "INSERT INTO recent_apps (position, name, path) VALUES (?, ?, ?)",
+            ((i, app["name"], app["path"]) for i, app in enumerate(recent_apps)))
+
+    def compact(self):
+        """Move WAL contents into the main database file"""
+        try:
+            self.db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        except sqlite3.Error as e:
+            print(f"Error saving app data: {e}")
+
+    def wait(self):
+        pass
+
+    def iter_sessions(self, app_name=None, after=0):
+        """Yield (row, app, start, duration, resources) in recording order
+
+        Rows are the sessions table ids, so a caller can resume after the
+        last row it has seen. Streams from the cursor. A read-only connection
+        to a database from before the start or resources columns falls back
+        to the local date and time, and no resources.
+        """
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}
+        start_column = "start" if "start" in columns else "NULL"
+        resources_column = "resources" if "resources" in columns else "NULL"
+        query = (f"SELECT id, app, date, start_time, {start_column}, duration, {resources_column} "
+                 "FROM sessions WHERE id > ?")
+        params = [after]
+        if app_name is not None:
+            query += " AND app = ?"
+            params.append(app_name)
+        for row, app, day, start_time, start, duration, resources in self.db.execute(query + " ORDER BY id", params):
+            if start is None:
+                start = local_start(day, start_time)
+            yield row, app, start, duration, json.loads(resources) if resources else None
+
+    def total_time(self, app_name, start_date=None, end_date=None):
+        """Total tracked seconds for app_name, optionally within a date range (inclusive)"""
+        if start_date is None and end_date is None:
+            self.refresh()
+            return self.app_data["summary"].get(app_name, {}).get("total_time", 0)
+
+        query = "SELECT COALESCE(SUM(duration), 0) FROM sessions WHERE app = ?"
+        params = [app_name]
+        if start_date is not None:
+            query += " AND date >= ?"
+            params.append(date_key(start_date))
+        if end_date is not None:
+            query += " AND date <= ?"
+            params.append(date_key(end_date))
+        return self.db.execute(query, params).fetchone()[0]
+
+
+def open_store(kind=None):
+    """Create the storage backend named by kind or PRODUCTIVITY_TIMER_STORE"""
+    kind = (kind or os.environ.get("PRODUCTIVITY_TIMER_STORE", "journal")).lower()
+    if kind == "sqlite":
+        return SqliteStore()
+    if kind != "journal":
+        print(f"Unknown storage backend '{kind}', using the journal")
+    return JournalStore()
@@ -0,0 +1,10 @@
+import os
+
+
+def target_key(path):
+    """Index key for a tracked executable: its lowercase basename
+
+    Kept apart from process_scanner so code that only needs the key (the
+    app state, the GUI before detection starts) does not import psutil.
+    """
+    return os.path.basename(path).lower() if path else ""
@@ -1,16 +1,20 @@
 import os
 import time
-import psutil
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QPushButton, QLabel)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QEvent, pyqtSignal
 from PyQt5.QtGui import QFont
+from process_watcher import ProcessWatcherThread
+from targets import target_key
+from display_scheduler import DisplayScheduler
+import metrics
+from metrics import timed
 
 class TimerPage(QMainWindow):
     # Signal to navigate back to app selector
     navigate_to_selector = pyqtSignal()
     
-    def __init__(self, app_state):
+    def __init__(self, app_state, watcher=None):
         super().__init__()
         self.app_state = app_state
         
@@ -28,13 +32,32 @@ class TimerPage(QMainWindow):
         self.setup_window_drag()
         
         # Setup timers
-        self.update_timer = QTimer(self)
-        self.update_timer.timeout.connect(self.update_time)
-        self.update_timer.setInterval(100)  # Update every 100ms for smoother display
-        
-        self.check_app_timer = QTimer(self)
-        self.check_app_timer.timeout.connect(self.check_target_app_running)
-        self.check_app_timer.setInterval(1000)  # Check every second
+        # The display only wakes up when the visible second changes
+        self.display_scheduler = DisplayScheduler(self)
+        self.display_scheduler.tick.connect(self.update_time)
+        if metrics.ENABLED:
+            self.display_scheduler.tick.connect(self.publish_display_stats)
+        
+        # Periodically checkpoint running sessions so a crash does not lose them
+        self.checkpoint_timer = QTimer(self)
+        self.checkpoint_timer.timeout.connect(self.app_state.checkpoint_sessions)
+        self.checkpoint_timer.setInterval(30000)  # Every 30 seconds
+        
+        # Process detection runs on a worker thread (or in the tracker daemon),
+        # we only get state changes
+        self.watching = False
+        self.process_watcher = watcher if watcher is not None else ProcessWatcherThread(self)
+        self.process_watcher.target_status_changed.connect(self.on_target_status_changed)
+        if hasattr(self.process_watcher, "target_elapsed_synced"):
+            self.process_watcher.target_elapsed_synced.connect(self.on_target_elapsed_synced)
+        
+        # Resource usage of the tracked app is sampled on the watcher's thread,
+        # which sends the summary of the session so far after every sample.
+        # Summaries still queued from an already saved session are ignored
+        self.sample_session = 0
+        self.resource_summary = None
+        if hasattr(self.process_watcher, "resources_sampled"):
+            self.process_watcher.resources_sampled.connect(self.on_resources_sampled)
         
         # Position window to top right corner
         self.position_window()
@@ -198,20 +221,59 @@ class TimerPage(QMainWindow):
     def show(self):
         super().show()
         
-        # Start checking for app
-        self.check_app_timer.start()
-        
-        # Update window title
-        self.findChild(QLabel, "window_title").setText(self.app_state.target_app_name)
+        # Start checking for the target and any extra tracked apps in one watcher
+        self.checkpoint_timer.start()
+        self.watching = True
+        self.process_watcher.watch(self.app_state.target_paths())
+        self.update_title()
+    
+    def track(self, name, path):
+        """Track another app alongside the running ones (a later launch asked for it)"""
+        self.app_state.add_target(name, path)
+        if self.watching:
+            self.process_watcher.watch(self.app_state.target_paths())
+        self.update_title()
+    
+    def update_title(self):
+        title = self.app_state.target_app_name
+        extra_targets = len(self.app_state.target_paths()) - 1
+        if extra_targets > 0:
+            title = f"{title} +{extra_targets}"
+        self.findChild(QLabel, "window_title").setText(title)
+    
+    def hideEvent(self, event):
+        # Nothing to repaint while hidden
+        self.display_scheduler.suspend()
+        super().hideEvent(event)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.isMinimized():
+            self.display_scheduler.resume()
+            if self.watching:
+                self.process_watcher.interact()
+    
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            if self.isMinimized():
+                self.display_scheduler.suspend()
+            else:
+                self.display_scheduler.resume()
+        super().changeEvent(event)
     
     def on_back_clicked(self):
         # Save session if running
         if self.app_state.is_running:
-            self.app_state.save_session_stats()
+            self.sync_elapsed_time()
+            self.save_session_stats()
+        self.app_state.stop_all_targets()
         
         # Stop timers
-        self.update_timer.stop()
-        self.check_app_timer.stop()
+        self.display_scheduler.stop()
+        self.process_watcher.stop_sampling()
+        self.checkpoint_timer.stop()
+        self.watching = False
+        self.process_watcher.unwatch()
         
         # Reset state
         self.app_state.is_running = False
@@ -222,15 +284,22 @@ class TimerPage(QMainWindow):
     def closeEvent(self, event):
         # Save session if running
         if self.app_state.is_running:
-            self.app_state.save_session_stats()
+            self.sync_elapsed_time()
+            self.save_session_stats()
+        self.app_state.stop_all_targets()
             
-        # Stop timers
-        self.update_timer.stop()
-        self.check_app_timer.stop()
+        # Stop timers and the watcher thread
+        self.display_scheduler.stop()
+        self.process_watcher.stop_sampling()
+        self.checkpoint_timer.stop()
+        self.watching = False
+        self.process_watcher.shutdown()
         
         super().closeEvent(event)
     
     def toggle_timer(self):
+        # The user is here, detect app starts/stops quickly again
+        self.process_watcher.interact()
         if not self.app_state.is_running:
             self.start_timer()
         else:
@@ -241,11 +310,13 @@ class TimerPage(QMainWindow):
         
         if self.app_state.start_time == 0:
             self.app_state.start_time = time.time()
+            self.display_scheduler.start(0)
         else:
             # Resume from pause: adjust start_time to account for elapsed time
             self.app_state.start_time = time.time() - self.app_state.elapsed_time
+            self.display_scheduler.start(self.app_state.elapsed_time)
         
-        self.update_timer.start()
+        self.process_watcher.start_sampling(target_key(self.app_state.target_app), self.sample_session)
         
         # Change button color to orange when running
         self.pause_button.setStyleSheet("background-color: #FFD699; border-radius: 8px; border: none;")
@@ -254,47 +325,73 @@ class TimerPage(QMainWindow):
     def pause_timer(self):
         # Save current elapsed time before pausing
         if self.app_state.is_running:
-            self.app_state.elapsed_time = time.time() - self.app_state.start_time
+            self.sync_elapsed_time()
         
         self.app_state.is_running = False
-        self.update_timer.stop()
+        self.display_scheduler.stop()
+        self.process_watcher.stop_sampling()
         
         # Change button color back to yellow when paused
         self.pause_button.setStyleSheet("background-color: #FFEB99; border-radius: 8px; border: none;")
     
-    def update_time(self):
+    def on_resources_sampled(self, session, summary):
+        if session == self.sample_session:
+            self.resource_summary = summary
+    
+    def save_session_stats(self):
+        """Save the session together with the app's resource usage summary"""
+        self.app_state.save_session_stats(self.resource_summary)
+        self.resource_summary = None
+        self.sample_session += 1
+    
+    def sync_elapsed_time(self):
+        self.app_state.elapsed_time = self.display_scheduler.elapsed()
+    
+    @timed("update_time")
+    def update_time(self, second=None):
         if self.app_state.is_running:
-            self.app_state.elapsed_time = time.time() - self.app_state.start_time
+            self.sync_elapsed_time()
             self.update_display()
     
     def update_display(self):
         hours, remainder = divmod(int(self.app_state.elapsed_time), 3600)
         minutes, seconds = divmod(remainder, 60)
         time_str = f"{hours:02}:{minutes:02}:{seconds:02}"
-        self.time_label.setText(time_str)
+        # Skip the repaint if the text did not change
+        if time_str != self.time_label.text():
+            self.time_label.setText(time_str)
+    
+    def publish_display_stats(self, second=None):
+        """Display wakeups per minute as gauges, to compare against the old 600/min"""
+        metrics.set_gauges("display", self.display_scheduler.stats())
     
-    def check_target_app_running(self):
-        if not self.app_state.target_app:
+    def on_target_status_changed(self, key, app_running):
+        # Ignore results still queued from before we stopped watching
+        if not self.watching:
             return
-            
-        target_basename = os.path.basename(self.app_state.target_app).lower()
-        app_running = False
-        
-        for proc in psutil.process_iter(['pid', 'name', 'exe']):
-            try:
-                process_exe = proc.info['exe']
-                if process_exe and os.path.basename(process_exe).lower() == target_basename:
-                    app_running = True
-                    break
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        
-        # Auto-start/stop timer based on app state
-        if app_running and not self.app_state.is_running and self.app_state.start_time == 0:
+        
+        # Extra tracked apps keep their own timers in the app state
+        if key != target_key(self.app_state.target_app):
+            self.app_state.set_target_running(key, app_running)
+            return
+        
+        # Auto-start/stop timer based on app state. When the daemon records
+        # sessions every run of the app is a new session, so always auto-start
+        auto_start = self.app_state.start_time == 0 or not self.app_state.records_sessions
+        if app_running and not self.app_state.is_running and auto_start:
             # App just started, auto-start timer
             self.start_timer()
         elif not app_running and self.app_state.is_running:
             # App was closed, auto-pause timer
             self.pause_timer()
             # Save session stats
-            self.app_state.save_session_stats()
\ No newline at end of file
+            self.save_session_stats()
+    
+    def on_target_elapsed_synced(self, key, elapsed):
+        """Follow the daemon's clock for the main target"""
+        if not self.watching or key != target_key(self.app_state.target_app):
+            return
+        if self.app_state.is_running:
+            self.app_state.start_time = time.time() - elapsed
+            self.app_state.elapsed_time = elapsed
+            self.display_scheduler.start(elapsed)
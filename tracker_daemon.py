@@ -0,0 +1,298 @@
+"""Headless tracker: process detection and session recording without PyQt
+
+Run with `python tracker_daemon.py [--track PATH ...]`. The daemon listens
+on a Unix domain socket (ipc.SOCKET_PATH); when it is running, the GUI
+attaches to it as a client instead of watching processes itself, and
+closing the GUI no longer stops tracking.
+
+Protocol: one JSON object per line. Requests carry a "cmd" field and get
+exactly one reply; subscribed clients also receive {"event": "status", ...}
+messages whenever a tracked app starts or stops. An "untrack" only drops
+the client's own interest in an app: apps given with --track, or still
+tracked by another connected client, stay tracked.
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import selectors
+from app_state import AppState
+from process_monitor import TargetMonitor, AdaptiveInterval
+from targets import target_key
+from ipc import SOCKET_PATH, encode, LineReader, daemon_available
+import metrics
+
+CHECKPOINT_INTERVAL = 30.0
+
+
+class TrackerDaemon:
+    """Runs TargetMonitor and AppState persistence on a selectors loop"""
+
+    def __init__(self, socket_path=SOCKET_PATH, interval=None, backend=None, track_tree=None):
+        self.socket_path = socket_path
+        self.app_state = AppState()
+        self.monitor = TargetMonitor(backend, AdaptiveInterval(min_ms=interval), track_tree)
+        self.selector = selectors.DefaultSelector()
+        self.server = None
+        self.clients = {}
+        self.client_targets = {}
+        self.pinned = set()
+        self.subscribers = set()
+        self.backend_fds = set()
+        self.running = False
+        self.next_poll = 0.0
+        self.next_checkpoint = 0.0
+
+        # Signals write to this pair so a shutdown request interrupts select()
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ, self.on_wakeup)
+
+    def listen(self):
+        """Bind the socket, replacing a stale one left by a dead daemon"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.server.listen(8)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ, self.accept)
+
+    # Tracked apps
+
+    def track(self, name, path, conn=None):
+        if conn is not None:
+            self.client_targets.setdefault(conn, set()).add(target_key(path))
+        self.app_state.add_target(name, path)
+        self.update_targets()
+
+    def untrack(self, path, conn=None):
+        """Stop tracking path unless it is pinned or another client tracks it, returns whether it stopped"""
+        key = target_key(path)
+        if conn is not None:
+            self.client_targets.get(conn, set()).discard(key)
+        if key in self.pinned or any(key in keys for keys in self.client_targets.values()):
+            return False
+        self.app_state.remove_target(path)
+        self.update_targets()
+        return True
+
+    def update_targets(self):
+        self.monitor.set_targets(self.app_state.target_paths())
+        self.poll()
+
+    def poll(self):
+        self.apply_changes(self.monitor.check())
+        self.next_poll = time.monotonic() + self.monitor.poll_interval() / 1000
+
+    def apply_changes(self, changes):
+        if metrics.ENABLED:
+            metrics.set_gauges("detection", self.monitor.stats())
+        for key, app_running in changes:
+            self.app_state.set_target_running(key, app_running)
+            self.broadcast(self.status_event(key))
+        self.update_backend_fds()
+
+    def status_event(self, key):
+        target = self.app_state.targets.get(key)
+        event = {"event": "status", "app": key, "running": False, "elapsed": 0, "start_time": 0}
+        if target is not None:
+            event.update({
+                "name": target.name,
+                "running": target.is_running,
+                "elapsed": time.time() - target.start_time if target.is_running else 0,
+                "start_time": target.start_time,
+            })
+        return event
+
+    def update_backend_fds(self):
+        fds = set(self.monitor.filenos())
+        for fd in self.backend_fds - fds:
+            self.selector.unregister(fd)
+        for fd in fds - self.backend_fds:
+            self.selector.register(fd, selectors.EVENT_READ, self.on_backend_readable)
+        self.backend_fds = fds
+
+    def on_backend_readable(self, fd):
+        self.apply_changes(self.monitor.handle_readable(fd))
+
+    # Clients
+
+    def accept(self, server):
+        try:
+            conn, _ = server.accept()
+        except OSError:
+            return
+        conn.setblocking(False)
+        self.clients[conn] = LineReader()
+        self.selector.register(conn, selectors.EVENT_READ, self.on_client_readable)
+
+    def on_client_readable(self, conn):
+        try:
+            data = conn.recv(65536)
+        except OSError:
+            data = b""
+        if not data:
+            self.drop_client(conn)
+            return
+
+        for message in self.clients[conn].feed(data):
+            # A bad request gets an error reply, it must not take the daemon down
+            try:
+                reply = self.handle_request(conn, message)
+            except Exception as e:
+                print(f"Error handling request {message!r}: {e}")
+                reply = {"ok": False, "error": f"request failed: {e}"}
+            if conn in self.clients:
+                self.send(conn, reply)
+
+    def handle_request(self, conn, message):
+        if not isinstance(message, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+        cmd = message.get("cmd")
+        if cmd in ("track", "untrack"):
+            path = message.get("path")
+            if not isinstance(path, str) or not path:
+                return {"ok": False, "error": f"{cmd} needs a non-empty \"path\""}
+            name = message.get("name")
+            if name is not None and not isinstance(name, str):
+                return {"ok": False, "error": "\"name\" must be a string"}
+        if cmd == "track":
+            self.track(name or os.path.basename(path), path, conn)
+            return {"ok": True, "status": self.status_event(target_key(path))}
+        if cmd == "untrack":
+            return {"ok": True, "removed": self.untrack(path, conn)}
+        if cmd == "status":
+            return {"ok": True, "targets": [self.status_event(key) for key in self.app_state.targets]}
+        if cmd == "subscribe":
+            self.subscribers.add(conn)
+            return {"ok": True, "targets": [self.status_event(key) for key in self.app_state.targets]}
+        if cmd == "interact":
+            self.monitor.interact()
+            self.poll()
+            return {"ok": True, "poll_interval_ms": self.monitor.poll_interval()}
+        if cmd == "stats":
+            return {"ok": True, "stats": self.monitor.stats()}
+        if cmd == "shutdown":
+            self.running = False
+            return {"ok": True}
+        return {"ok": False, "error": f"unknown command: {cmd!r}"}
+
+    def send(self, conn, message):
+        try:
+            conn.sendall(encode(message))
+        except OSError:
+            self.drop_client(conn)
+
+    def broadcast(self, message):
+        for conn in list(self.subscribers):
+            self.send(conn, message)
+
+    def drop_client(self, conn):
+        if conn in self.clients:
+            self.selector.unregister(conn)
+            del self.clients[conn]
+        # Its apps stay tracked: closing the GUI does not stop tracking
+        self.client_targets.pop(conn, None)
+        self.subscribers.discard(conn)
+        conn.close()
+
+    # Main loop
+
+    def timeout(self, now):
+        deadlines = [self.next_checkpoint]
+        if self.monitor.needs_polling():
+            deadlines.append(self.next_poll)
+        return max(0.0, min(deadlines) - now)
+
+    def run(self):
+        # Running sessions are recorded and the socket removed however the loop ends
+        try:
+            self.listen()
+            self.update_targets()
+            self.running = True
+            self.next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL
+
+            while self.running:
+                for key, _ in self.selector.select(self.timeout(time.monotonic())):
+                    key.data(key.fileobj)
+
+                now = time.monotonic()
+                if self.monitor.needs_polling() and now >= self.next_poll:
+                    self.poll()
+                if now >= self.next_checkpoint:
+                    self.app_state.checkpoint_sessions()
+                    self.next_checkpoint = now + CHECKPOINT_INTERVAL
+        finally:
+            self.close()
+
+    def on_wakeup(self, reader):
+        try:
+            reader.recv(4096)
+        except OSError:
+            pass
+
+    def stop(self, *_):
+        self.running = False
+        try:
+            self.wakeup_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def close(self):
+        """Record every running session and release the socket"""
+        self.app_state.stop_all_targets()
+        self.app_state.save_app_data()
+        self.app_state.store.wait()
+
+        for conn in list(self.clients):
+            self.drop_client(conn)
+        if self.server is not None:
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        self.monitor.close()
+        self.selector.close()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless productivity timer tracker")
+    parser.add_argument("--track", action="append", default=[], metavar="PATH",
+                        help="executable to track (may be repeated)")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--interval", type=int, default=None, metavar="MS",
+                        help="fastest poll interval in milliseconds (backs off while nothing changes)")
+    parser.add_argument("--track-children", action="store_true", default=None,
+                        help="count an app as running while any of its child processes is alive")
+    args = parser.parse_args(argv)
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("The tracker daemon needs Unix domain sockets")
+        return 1
+    if daemon_available(args.socket):
+        print(f"A tracker daemon is already listening on {args.socket}")
+        return 1
+
+    metrics.start()
+    daemon = TrackerDaemon(args.socket, args.interval, track_tree=args.track_children)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    for path in args.track:
+        daemon.pinned.add(target_key(path))
+        daemon.app_state.add_target(os.path.basename(path), path)
+
+    daemon.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())